@@ -0,0 +1,94 @@
+import time
+import random
+import argparse
+from datetime import datetime
+
+from watermarker import parse_exif_date, parse_date_string
+
+
+def legacy_parse_exif_date(exif_date):
+    """旧版日期解析：逐字符过滤后依次尝试六种strptime格式（仅用于对比）"""
+    if not exif_date:
+        return None
+
+    try:
+        date_str = ''.join(c for c in exif_date if c.isprintable())
+
+        formats_to_try = [
+            "%Y:%m:%d %H:%M:%S",
+            "%Y-%m-%d %H:%M:%S",
+            "%Y/%m/%d %H:%M:%S",
+            "%Y:%m:%d",
+            "%Y-%m-%d",
+            "%Y/%m/%d"
+        ]
+
+        for fmt in formats_to_try:
+            try:
+                if ' ' in date_str:
+                    date_part = date_str.split()[0]
+                    return datetime.strptime(date_part, fmt.split()[0]).date()
+                else:
+                    return datetime.strptime(date_str, fmt).date()
+            except ValueError:
+                continue
+
+    except Exception as e:
+        print(f"解析日期 '{exif_date}' 时出错: {e}")
+
+    return None
+
+
+def make_samples(count, burst):
+    """生成测试用的日期字符串，每burst张共用同一时刻（模拟连拍），覆盖所有支持的分隔符"""
+    rng = random.Random(0)
+    separators = [':', ':', ':', '-', '/']
+    samples = []
+    while len(samples) < count:
+        sep = rng.choice(separators)
+        date_str = (f"{rng.randint(2000, 2024)}{sep}{rng.randint(1, 12):02d}{sep}{rng.randint(1, 28):02d}"
+                    f" {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}")
+        if rng.random() < 0.1:
+            # EXIF字符串末尾常带有\0
+            date_str += '\x00'
+        samples.extend([date_str] * burst)
+    return samples[:count]
+
+
+def time_per_call(parse, samples, repeat):
+    """每次调用的平均耗时（微秒），取多轮中的最小值"""
+    best = None
+    for _ in range(repeat):
+        parse_date_string.cache_clear()
+        start_time = time.perf_counter()
+        for date_str in samples:
+            parse(date_str)
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(samples) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='对比EXIF日期解析的单次调用耗时')
+    parser.add_argument('--count', type=int, default=20000, help='日期字符串数量')
+    parser.add_argument('--burst', type=int, default=5, help='连拍张数（共用同一日期字符串的数量）')
+    parser.add_argument('--repeat', type=int, default=5, help='重复轮数')
+    args = parser.parse_args(argv)
+
+    samples = make_samples(args.count, max(1, args.burst))
+    mismatches = [s for s in set(samples) if legacy_parse_exif_date(s) != parse_exif_date(s)]
+    print(f"测试字符串: {len(samples)} 个（不同值 {len(set(samples))} 个），结果不一致: {len(mismatches)} 个")
+
+    unique_samples = list(dict.fromkeys(samples))
+    results = [
+        ('legacy', legacy_parse_exif_date, samples),
+        ('regex', parse_exif_date, unique_samples),
+        ('regex+缓存', parse_exif_date, samples),
+    ]
+    for name, parse, data in results:
+        per_call = time_per_call(parse, data, args.repeat)
+        print(f"  {name:10s} 每次 {per_call:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
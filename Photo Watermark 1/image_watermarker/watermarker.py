@@ -1,99 +1,179 @@
 #!/usr/bin/env python3
+import io
 import os
+import sys
+import time
 import argparse
-from PIL import Image, ImageDraw, ImageFont, ExifTags
-from datetime import datetime
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from PIL import Image, ImageDraw, ImageFont, ExifTags, UnidentifiedImageError
+from datetime import date, datetime
+from fnmatch import fnmatch
+from functools import lru_cache
+import re
+import struct
 import piexif
 
-
-def get_exif_date(image_path):
-    """从图片中获取拍摄日期（改进版本）"""
+# 可处理的图片扩展名，其他文件在遍历时直接忽略，不会被打开
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tif', '.tiff', '.webp'}
+
+# EXIF日期相关标签
+EXIF_TAG_DATETIME = 0x0132
+EXIF_TAG_DATETIME_ORIGINAL = 0x9003
+EXIF_TAG_DATETIME_DIGITIZED = 0x9004
+# IFD0中指向Exif IFD的标签
+EXIF_TAG_EXIF_IFD = 0x8769
+# JPEG APP1段中EXIF数据的标识和TIFF文件头（小端、大端）
+EXIF_HEADER = b'Exif\x00\x00'
+TIFF_HEADERS = (b'II*\x00', b'MM\x00*')
+# EXIF日期格式：年月日以 : - / 中的同一种分隔，其后为可选的时间部分（如 2023:05:01 12:30:00）
+EXIF_DATE_PATTERN = re.compile(r'\s*(\d{4})([:/-])(\d{1,2})\2(\d{1,2})(?:\s|$)')
+# 解析前删除的控制字符
+NON_PRINTABLE_CHARS = dict.fromkeys([*range(0x20), *range(0x7f, 0xa0)])
+
+# 单个IFD最多读取的标签数，防止损坏的文件导致大量读取
+MAX_IFD_ENTRIES = 1024
+
+# 图片文件头魔数（WebP另外检查RIFF容器中的格式标识）
+IMAGE_SIGNATURES = (
+    b'\xff\xd8\xff',          # JPEG
+    b'\x89PNG\r\n\x1a\n',     # PNG
+    b'BM',                    # BMP
+    b'GIF87a', b'GIF89a',     # GIF
+    b'II*\x00', b'MM\x00*',   # TIFF
+)
+
+
+def get_exif_date_from_image(img):
+    """从已打开的图片中获取拍摄日期，EXIF数据在打开文件时已读入，无需再次读取文件"""
     try:
-        # 方法1: 使用piexif库（更可靠）
-        try:
-            exif_dict = piexif.load(image_path)
-            if "Exif" in exif_dict:
-                # 检查DateTimeOriginal (36868)
-                if piexif.ExifIFD.DateTimeOriginal in exif_dict["Exif"]:
-                    date_str = exif_dict["Exif"][piexif.ExifIFD.DateTimeOriginal].decode('utf-8')
-                    return date_str
-
-                # 检查DateTime (306)
-                if piexif.ImageIFD.DateTime in exif_dict["0th"]:
-                    date_str = exif_dict["0th"][piexif.ImageIFD.DateTime].decode('utf-8')
-                    return date_str
-        except:
-            pass
-
-        # 方法2: 使用PIL的原始方法（备用）
-        with Image.open(image_path) as img:
-            exif_data = img._getexif()
-            if exif_data:
-                # 检查所有可能的日期标签
-                date_tags = [
-                    36867,  # DateTimeOriginal
-                    306,  # DateTime
-                    36868  # DateTimeDigitized
-                ]
-
-                for tag in date_tags:
-                    if tag in exif_data:
-                        date_value = exif_data[tag]
-                        if isinstance(date_value, str):
-                            return date_value
-
-                # 遍历所有EXIF标签查找日期
-                for tag, value in exif_data.items():
-                    tag_name = ExifTags.TAGS.get(tag, '')
-                    if 'date' in tag_name.lower() or 'time' in tag_name.lower():
-                        if isinstance(value, str):
-                            return value
-
+        exif_bytes = img.info.get('exif')
+        if exif_bytes:
+            # JPEG的EXIF数据以 Exif\0\0 开头，其后为TIFF结构；PNG、WebP中的EXIF数据直接是TIFF结构
+            base = len(EXIF_HEADER) if exif_bytes.startswith(EXIF_HEADER) else 0
+            return read_tiff_date(io.BytesIO(exif_bytes), base)
+
+        # TIFF文件的标签在打开时已解析；PNG的eXIf块位于图像数据之后时，getexif会在读取像素数据时一并读入
+        exif = img.getexif()
+        if exif:
+            exif_ifd = exif.get_ifd(EXIF_TAG_EXIF_IFD)
+            for value in (exif_ifd.get(EXIF_TAG_DATETIME_ORIGINAL), exif.get(EXIF_TAG_DATETIME),
+                          exif_ifd.get(EXIF_TAG_DATETIME_DIGITIZED)):
+                if isinstance(value, bytes):
+                    value = value.decode('ascii', 'ignore')
+                if isinstance(value, str) and value.strip('\x00 '):
+                    return value.strip('\x00 ')
     except Exception as e:
         print(f"读取EXIF时出错: {e}")
 
     return None
 
 
+def read_tiff_date(f, base):
+    """从TIFF结构中读取日期，base为TIFF头在文件中的位置
+
+    只读取IFD0和Exif IFD的标签目录，以及日期字符串本身，缩略图和厂商注释等数据不会被读取。
+    按 DateTimeOriginal、DateTime、DateTimeDigitized 的顺序返回第一个存在的日期
+    """
+    f.seek(base)
+    header = f.read(8)
+    if len(header) < 8 or header[:4] not in TIFF_HEADERS:
+        return None
+    byte_order = '<' if header[:2] == b'II' else '>'
+    ifd0_offset = struct.unpack(byte_order + 'I', header[4:])[0]
+
+    ifd0 = read_ifd_entries(f, base, ifd0_offset, byte_order, (EXIF_TAG_DATETIME, EXIF_TAG_EXIF_IFD))
+    exif_ifd = {}
+    if EXIF_TAG_EXIF_IFD in ifd0:
+        exif_ifd_offset = struct.unpack(byte_order + 'I', ifd0[EXIF_TAG_EXIF_IFD][2])[0]
+        exif_ifd = read_ifd_entries(f, base, exif_ifd_offset, byte_order,
+                                    (EXIF_TAG_DATETIME_ORIGINAL, EXIF_TAG_DATETIME_DIGITIZED))
+
+    for tags, tag in ((exif_ifd, EXIF_TAG_DATETIME_ORIGINAL), (ifd0, EXIF_TAG_DATETIME),
+                      (exif_ifd, EXIF_TAG_DATETIME_DIGITIZED)):
+        if tag in tags:
+            date_str = read_ascii_value(f, base, byte_order, *tags[tag])
+            if date_str:
+                return date_str
+    return None
+
+
+def read_ifd_entries(f, base, offset, byte_order, wanted_tags):
+    """读取一个IFD的标签目录，返回所需标签的 标签 -> (类型, 数量, 值或偏移量的原始4字节)"""
+    f.seek(base + offset)
+    data = f.read(2)
+    if len(data) < 2:
+        return {}
+    count = struct.unpack(byte_order + 'H', data)[0]
+    entries = f.read(min(count, MAX_IFD_ENTRIES) * 12)
+    result = {}
+    for start in range(0, len(entries) - 11, 12):
+        tag, value_type, value_count, value = struct.unpack(byte_order + 'HHI4s', entries[start:start + 12])
+        if tag in wanted_tags:
+            result[tag] = (value_type, value_count, value)
+    return result
+
+
+def read_ascii_value(f, base, byte_order, value_type, value_count, value):
+    """读取ASCII类型标签的字符串，不超过4字节时直接保存在标签目录中"""
+    if value_type != 2 or value_count == 0:
+        return None
+    if value_count <= 4:
+        data = value[:value_count]
+    else:
+        f.seek(base + struct.unpack(byte_order + 'I', value)[0])
+        # 日期字符串固定为20字节，限制读取长度防止损坏的数量字段导致大量读取
+        data = f.read(min(value_count, 64))
+    return data.split(b'\x00', 1)[0].decode('ascii', 'ignore').strip() or None
+
+
+def get_watermark_date(img, file_stat, debug=False):
+    """根据EXIF日期（或文件修改日期）生成水印文字，返回 (水印文字, 日期来源)"""
+    exif_date = get_exif_date_from_image(img)
+    if debug:
+        print(f"提取的EXIF日期: {exif_date}")
+
+    if exif_date:
+        parsed_date = parse_exif_date(exif_date)
+        if parsed_date:
+            return parsed_date.strftime("%Y-%m-%d"), "EXIF日期"
+        return "日期未知", "EXIF解析失败"
+
+    # 使用文件修改日期作为备选
+    file_date = datetime.fromtimestamp(file_stat.st_mtime).date()
+    return file_date.strftime("%Y-%m-%d"), "文件修改日期"
+
+
 def parse_exif_date(exif_date):
     """解析EXIF日期格式（改进版本）"""
     if not exif_date:
         return None
 
     try:
-        # 处理不同的EXIF日期格式
-        date_str = exif_date
-
-        # 移除可能的乱码字符
-        date_str = ''.join(c for c in date_str if c.isprintable())
-
-        # 尝试不同的日期格式
-        formats_to_try = [
-            "%Y:%m:%d %H:%M:%S",
-            "%Y-%m-%d %H:%M:%S",
-            "%Y/%m/%d %H:%M:%S",
-            "%Y:%m:%d",
-            "%Y-%m-%d",
-            "%Y/%m/%d"
-        ]
-
-        for fmt in formats_to_try:
-            try:
-                # 只取日期部分
-                if ' ' in date_str:
-                    date_part = date_str.split()[0]
-                    return datetime.strptime(date_part, fmt.split()[0]).date()
-                else:
-                    return datetime.strptime(date_str, fmt).date()
-            except ValueError:
-                continue
-
+        return parse_date_string(exif_date)
     except Exception as e:
         print(f"解析日期 '{exif_date}' 时出错: {e}")
 
     return None
 
 
+@lru_cache(maxsize=4096)
+def parse_date_string(date_str):
+    """用预编译的正则一次匹配所有支持的日期格式，只取日期部分
+
+    同一时刻连拍的照片日期字符串相同，结果会被缓存
+    """
+    # 移除可能的乱码字符
+    match = EXIF_DATE_PATTERN.match(date_str.translate(NON_PRINTABLE_CHARS))
+    if match is None:
+        return None
+    year, _, month, day = match.groups()
+    try:
+        return date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
 def debug_exif_info(image_path):
     """调试函数：显示图片的所有EXIF信息"""
     print(f"\n调试 {os.path.basename(image_path)} 的EXIF信息:")
@@ -134,21 +214,28 @@ def debug_exif_info(image_path):
         print(f"PIL调试失败: {e}")
 
 
-def add_watermark(image_path, watermark_text, font_size, color, position, output_path=None):
-    """为图片添加水印"""
+@lru_cache(maxsize=32)
+def load_font(font_size):
+    """加载指定字号的字体，同一字号只加载一次"""
+    try:
+        return ImageFont.truetype("arial.ttf", font_size)
+    except IOError:
+        # 如果找不到字体，使用默认字体
+        return ImageFont.load_default()
+
+
+def add_watermark(image_path, watermark_text, font_size, color, position, output_path=None, image=None):
+    """为图片添加水印，image为已打开的图片时直接在其上绘制，不再重新打开文件"""
     try:
         # 打开图片
-        image = Image.open(image_path)
+        if image is None:
+            image = Image.open(image_path)
 
         # 创建可绘制对象
         draw = ImageDraw.Draw(image)
 
-        # 尝试加载字体
-        try:
-            font = ImageFont.truetype("arial.ttf", font_size)
-        except IOError:
-            # 如果找不到字体，使用默认字体
-            font = ImageFont.load_default()
+        # 加载字体
+        font = load_font(font_size)
 
         # 使用textbbox方法获取文本尺寸
         bbox = draw.textbbox((0, 0), watermark_text, font=font)
@@ -216,85 +303,308 @@ def print_watermark_info(info):
         print()
 
 
-def process_directory(input_dir, font_size=20, color='red', position='center', debug=False):
-    """处理目录中的所有图片"""
+def process_file(file_path, output_path, font_size=20, color='red', position='center', debug=False,
+                 file_stat=None):
+    """处理单个图片：只打开一次文件，EXIF日期、文件信息和解码后的图片依次传给绘制和保存
+
+    不是图片文件时抛出UnidentifiedImageError
+    """
+    if file_stat is None:
+        file_stat = os.stat(file_path)
+
+    with Image.open(file_path) as img:
+        # 调试模式：显示EXIF信息
+        if debug:
+            debug_exif_info(file_path)
+
+        # 从已打开的图片中读取EXIF日期
+        watermark_text, exif_source = get_watermark_date(img, file_stat, debug)
+
+        # 在已打开的图片上添加水印
+        result = add_watermark(
+            file_path,
+            watermark_text,
+            font_size,
+            color,
+            position,
+            output_path,
+            image=img
+        )
+
+    if result:
+        # 添加EXIF来源信息
+        result['exif_source'] = exif_source
+    return result
+
+
+def get_output_path(file_path, output_dir, relative_dir=''):
+    """构建输出路径，relative_dir为文件相对于输入目录的子目录，输出时保持相同的目录结构"""
+    name, ext = os.path.splitext(os.path.basename(file_path))
+    output_filename = f"{name}_watermarked{ext}"
+    return os.path.join(output_dir, relative_dir, output_filename)
+
+
+def is_image_header(file_path):
+    """读取文件头的魔数判断是否为图片，避免用Image.open逐个尝试解码插件"""
+    try:
+        with open(file_path, 'rb') as f:
+            header = f.read(16)
+    except OSError:
+        return False
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return True
+    return any(header.startswith(signature) for signature in IMAGE_SIGNATURES)
+
+
+def matches_patterns(relative_path, patterns):
+    """文件名或相对路径匹配任意一个通配符"""
+    name = os.path.basename(relative_path)
+    return any(fnmatch(name, pattern) or fnmatch(relative_path, pattern) for pattern in patterns)
+
+
+def iter_image_files(input_dir, recursive=False, include=None, exclude=None, counters=None, skip_dir=None):
+    """用os.scandir流式遍历目录，按扩展名和通配符筛选，逐个产出 (文件路径, 相对子目录, 文件信息)
+
+    include/exclude为通配符列表，匹配文件名或以 / 分隔的相对路径；exclude同样用于排除子目录。
+    counters不为None时在其中累计被扩展名或通配符过滤掉的文件数（'ignored'）；
+    skip_dir为不进入的目录（输出目录位于输入目录中时避免处理已加水印的图片）
+    """
+    skip_dir = os.path.realpath(skip_dir) if skip_dir else None
+    pending_dirs = ['']
+    while pending_dirs:
+        relative_dir = pending_dirs.pop()
+        try:
+            with os.scandir(os.path.join(input_dir, relative_dir)) as entries:
+                sub_dirs = []
+                for entry in sorted(entries, key=lambda entry: entry.name):
+                    relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if (recursive and not (exclude and matches_patterns(relative_path, exclude))
+                                    and os.path.realpath(entry.path) != skip_dir):
+                                sub_dirs.append(relative_path)
+                            continue
+                        if not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+
+                    _, ext = os.path.splitext(entry.name)
+                    if (ext.lower() not in IMAGE_EXTENSIONS
+                            or (include and not matches_patterns(relative_path, include))
+                            or (exclude and matches_patterns(relative_path, exclude))):
+                        if counters is not None:
+                            counters['ignored'] = counters.get('ignored', 0) + 1
+                        continue
+                    try:
+                        # 文件信息随任务传给process_file，每个文件只stat一次；遍历期间被删除的文件直接跳过
+                        file_stat = entry.stat()
+                    except OSError:
+                        continue
+                    yield entry.path, relative_dir, file_stat
+        except OSError as e:
+            print(f"无法读取目录 {os.path.join(input_dir, relative_dir)}: {e}")
+            continue
+        # 逆序入栈，使子目录按名称顺序处理
+        pending_dirs.extend(reversed(sub_dirs))
+
+
+def process_task(task):
+    """工作进程中处理单个文件，返回 (文件路径, 状态, 水印信息或错误信息)
+
+    状态为 'processed'、'skipped'（非图片文件）或 'failed'（包括创建目录、读写文件出错）；处理过程中的输出被收集为错误信息，
+    避免多个进程的输出与进度行交错
+    """
+    file_path, output_path, font_size, color, position, file_stat = task
+    # 先检查文件头，扩展名是图片但内容不是的文件无需打开解码
+    if not is_image_header(file_path):
+        return file_path, 'skipped', None
+    output = io.StringIO()
+    try:
+        with redirect_stdout(output):
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            result = process_file(file_path, output_path, font_size, color, position, file_stat=file_stat)
+    except UnidentifiedImageError:
+        # 文件头像图片但Pillow无法识别，同样视为非图片文件
+        return file_path, 'skipped', None
+    except Exception as e:
+        return file_path, 'failed', str(e)
+    if result:
+        return file_path, 'processed', result
+    return file_path, 'failed', output.getvalue().strip() or "添加水印失败"
+
+
+def process_chunk(tasks):
+    """工作进程中依次处理一批文件，减少进程间通信次数"""
+    return [process_task(task) for task in tasks]
+
+
+def iter_chunks(items, chunk_size):
+    """把可迭代对象按固定大小分批"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_tasks(tasks, jobs=1, chunk_size=16):
+    """按批处理任务并逐个产出结果，jobs大于1时使用进程池，同时在途的批次数有上限"""
+    chunks = iter_chunks(tasks, chunk_size)
+    if jobs <= 1:
+        for chunk in chunks:
+            yield from process_chunk(chunk)
+        return
+
+    max_in_flight = jobs * 2
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = set()
+        for chunk in chunks:
+            pending.add(executor.submit(process_chunk, chunk))
+            if len(pending) < max_in_flight:
+                continue
+            # 在途批次已满，等待任意一批完成后再提交新的批次
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+        for future in as_completed(pending):
+            yield from future.result()
+
+
+class ProgressLine:
+    """在同一行刷新的进度显示，限制刷新频率以减少终端输出"""
+
+    def __init__(self, interval=0.2, stream=None):
+        self.interval = interval
+        self.stream = stream or sys.stdout
+        self.start_time = time.perf_counter()
+        self.last_update = 0
+        self.width = 0
+
+    def update(self, stats, force=False):
+        now = time.perf_counter()
+        if not force and now - self.last_update < self.interval:
+            return
+        self.last_update = now
+        elapsed = now - self.start_time
+        done = stats['processed'] + stats['skipped'] + stats['failed']
+        rate = done / elapsed if elapsed > 0 else 0
+        line = (f"已处理 {done} 个文件（成功 {stats['processed']}，跳过 {stats['skipped']}，"
+                f"失败 {stats['failed']}）{rate:.1f} 个/秒")
+        self.stream.write("\r" + line.ljust(self.width))
+        self.stream.flush()
+        self.width = len(line)
+
+    def finish(self, stats):
+        self.update(stats, force=True)
+        self.stream.write("\n")
+        self.stream.flush()
+
+
+def process_directory(input_dir, font_size=20, color='red', position='center', debug=False, jobs=None,
+                      verbose=False, recursive=False, include=None, exclude=None):
+    """处理目录中的所有图片
+
+    jobs为并行进程数（默认为CPU核心数）；默认只显示一行进度，verbose为True时输出每个文件的水印信息，
+    debug模式下按顺序逐个处理并显示EXIF信息；recursive为True时处理所有子目录，输出保持原目录结构；
+    include/exclude为文件名或相对路径的通配符列表
+    """
     # 创建输出目录 - 修改为在当前目录下创建 _watermark 文件夹
     output_dir = os.path.join(os.getcwd(), "_watermark")
     os.makedirs(output_dir, exist_ok=True)
     print(f"创建输出目录: {output_dir}")
     print()
 
+    counters = {'ignored': 0}
+    files = iter_image_files(input_dir, recursive, include, exclude, counters, output_dir)
+
+    if debug:
+        process_directory_serial(files, output_dir, font_size, color, position, debug, counters)
+        return
+
+    if jobs is None or jobs < 1:
+        jobs = os.cpu_count() or 1
+
+    def iter_tasks():
+        for file_path, relative_dir, file_stat in files:
+            yield (file_path, get_output_path(file_path, output_dir, relative_dir), font_size, color, position,
+                   file_stat)
+
+    # 结果在主进程中汇总，统计与完成顺序无关
+    stats = {'processed': 0, 'skipped': 0, 'failed': 0}
+    exif_sources = {}
+    failures = []
+    progress = ProgressLine()
+    for file_path, status, payload in run_tasks(iter_tasks(), jobs):
+        stats[status] += 1
+        if status == 'processed':
+            exif_sources[payload['exif_source']] = exif_sources.get(payload['exif_source'], 0) + 1
+            if verbose:
+                print_watermark_info(payload)
+        elif status == 'failed':
+            failures.append((file_path, payload))
+        if not verbose:
+            progress.update(stats)
+    if not verbose:
+        progress.finish(stats)
+
+    # 输出处理统计信息
+    print("\n" + "=" * 60)
+    print("处理完成统计:")
+    print(f"  成功处理: {stats['processed']} 个文件")
+    for exif_source in sorted(exif_sources):
+        print(f"    {exif_source}: {exif_sources[exif_source]} 个")
+    print(f"  跳过文件: {stats['skipped'] + stats['failed']} 个文件（非图片 {stats['skipped']} 个，出错 {stats['failed']} 个）")
+    print(f"  忽略文件: {counters['ignored']} 个（扩展名不是图片或被通配符排除）")
+    print(f"  并行进程: {jobs}")
+    print(f"  输出目录: {output_dir}")
+    if failures:
+        print("  出错文件:")
+        for file_path, error in sorted(failures):
+            print(f"    {os.path.relpath(file_path, input_dir)}: {error}")
+    print("=" * 60)
+
+
+def process_directory_serial(files, output_dir, font_size, color, position, debug, counters):
+    """在当前进程中逐个处理图片，并输出每个文件的水印信息"""
     processed_count = 0
     skipped_count = 0
 
-    # 遍历目录中的文件
-    for filename in os.listdir(input_dir):
-        file_path = os.path.join(input_dir, filename)
-        if os.path.isfile(file_path):
-            try:
-                # 检查是否为图片文件
-                with Image.open(file_path) as img:
-                    # 调试模式：显示EXIF信息
-                    if debug:
-                        debug_exif_info(file_path)
-
-                    # 获取EXIF日期信息
-                    exif_date = get_exif_date(file_path)
-                    if debug:
-                        print(f"提取的EXIF日期: {exif_date}")
-
-                    if exif_date:
-                        parsed_date = parse_exif_date(exif_date)
-                        if parsed_date:
-                            watermark_text = parsed_date.strftime("%Y-%m-%d")
-                            exif_source = "EXIF日期"
-                        else:
-                            watermark_text = "日期未知"
-                            exif_source = "EXIF解析失败"
-                    else:
-                        # 使用文件修改日期作为备选
-                        file_mtime = os.path.getmtime(file_path)
-                        file_date = datetime.fromtimestamp(file_mtime).date()
-                        watermark_text = file_date.strftime("%Y-%m-%d")
-                        exif_source = "文件修改日期"
-
-                    # 构建输出路径
-                    name, ext = os.path.splitext(filename)
-                    output_filename = f"{name}_watermarked{ext}"
-                    output_path = os.path.join(output_dir, output_filename)
-
-                    # 添加水印
-                    result = add_watermark(
-                        file_path,
-                        watermark_text,
-                        font_size,
-                        color,
-                        position,
-                        output_path
-                    )
-
-                    if result:
-                        # 添加EXIF来源信息
-                        result['exif_source'] = exif_source
-                        print_watermark_info(result)
-                        processed_count += 1
-                    else:
-                        skipped_count += 1
-
-            except IOError:
-                # 不是图片文件，跳过
-                print(f"跳过非图片文件: {filename}")
-                skipped_count += 1
-                continue
-            except Exception as e:
-                print(f"处理文件 {filename} 时出错: {e}")
+    for file_path, relative_dir, file_stat in files:
+        filename = os.path.join(relative_dir, os.path.basename(file_path))
+        if not is_image_header(file_path):
+            print(f"跳过非图片文件: {filename}")
+            skipped_count += 1
+            continue
+        try:
+            output_path = get_output_path(file_path, output_dir, relative_dir)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            result = process_file(file_path, output_path, font_size, color, position, debug, file_stat)
+
+            if result:
+                print_watermark_info(result)
+                processed_count += 1
+            else:
                 skipped_count += 1
 
+        except UnidentifiedImageError:
+            # 不是图片文件，跳过；创建目录、保存等其他错误由下面报告
+            print(f"跳过非图片文件: {filename}")
+            skipped_count += 1
+            continue
+        except Exception as e:
+            print(f"处理文件 {filename} 时出错: {e}")
+            skipped_count += 1
+
     # 输出处理统计信息
     print("\n" + "=" * 60)
     print("处理完成统计:")
     print(f"  成功处理: {processed_count} 个文件")
     print(f"  跳过文件: {skipped_count} 个文件")
+    print(f"  忽略文件: {counters['ignored']} 个（扩展名不是图片或被通配符排除）")
     print(f"  输出目录: {output_dir}")
     print("=" * 60)
 
@@ -308,6 +618,14 @@ def main():
                         choices=['center', 'top-left', 'top-right', 'bottom-left', 'bottom-right'],
                         help='水印位置')
     parser.add_argument('--debug', '-d', action='store_true', help='调试模式：显示EXIF信息')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help='处理目录时的并行进程数（默认为CPU核心数）')
+    parser.add_argument('--recursive', '-r', action='store_true', help='处理目录时包含所有子目录，输出保持原目录结构')
+    parser.add_argument('--include', action='append', default=[], metavar='PATTERN',
+                        help='只处理匹配的文件（文件名或相对路径通配符，可多次指定）')
+    parser.add_argument('--exclude', action='append', default=[], metavar='PATTERN',
+                        help='排除匹配的文件或子目录（文件名或相对路径通配符，可多次指定）')
+    parser.add_argument('--verbose', '-v', action='store_true', help='处理目录时输出每个文件的水印信息')
 
     args = parser.parse_args()
 
@@ -321,59 +639,30 @@ def main():
             args.font_size,
             args.color,
             args.position,
-            args.debug
+            args.debug,
+            args.jobs,
+            args.verbose,
+            args.recursive,
+            args.include,
+            args.exclude
         )
     elif os.path.isfile(args.image):
         print(f"开始处理单个文件: {args.image}")
         print(f"字体大小: {args.font_size}, 颜色: {args.color}, 位置: {args.position}")
         print()
 
-        # 调试模式：显示EXIF信息
-        if args.debug:
-            debug_exif_info(args.image)
-
-        # 获取EXIF日期信息
-        exif_date = get_exif_date(args.image)
-        if args.debug:
-            print(f"提取的EXIF日期: {exif_date}")
-
-        if exif_date:
-            parsed_date = parse_exif_date(exif_date)
-            if parsed_date:
-                watermark_text = parsed_date.strftime("%Y-%m-%d")
-                exif_source = "EXIF日期"
-            else:
-                watermark_text = "日期未知"
-                exif_source = "EXIF解析失败"
-        else:
-            # 使用文件修改日期作为备选
-            file_mtime = os.path.getmtime(args.image)
-            file_date = datetime.fromtimestamp(file_mtime).date()
-            watermark_text = file_date.strftime("%Y-%m-%d")
-            exif_source = "文件修改日期"
-
-        # 构建输出路径
-        input_dir = os.path.dirname(args.image)
         output_dir = os.path.join(os.getcwd(), "_watermark")
         os.makedirs(output_dir, exist_ok=True)
+        output_path = get_output_path(args.image, output_dir)
 
-        name, ext = os.path.splitext(os.path.basename(args.image))
-        output_filename = f"{name}_watermarked{ext}"
-        output_path = os.path.join(output_dir, output_filename)
-
-        # 添加水印
-        result = add_watermark(
-            args.image,
-            watermark_text,
-            args.font_size,
-            args.color,
-            args.position,
-            output_path
-        )
+        # 打开一次文件，读取EXIF日期并添加水印
+        try:
+            result = process_file(args.image, output_path, args.font_size, args.color, args.position, args.debug)
+        except IOError as e:
+            print(f"处理图片 {args.image} 时出错: {e}")
+            result = None
 
         if result:
-            # 添加EXIF来源信息
-            result['exif_source'] = exif_source
             print_watermark_info(result)
             print(f"单个文件处理完成!")
         else:
@@ -0,0 +1,144 @@
+import os
+import time
+import multiprocessing
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from watermark_processor import WatermarkProcessor
+
+# 单个导出任务：每个任务携带自己的水印设置快照，互不共享处理器状态；encoder_options为编码参数
+ExportJob = namedtuple('ExportJob', ['input_path', 'output_path', 'format_type', 'settings', 'encoder_options'],
+                       defaults=(None,))
+
+# 单个导出任务的结果，skipped为True表示输出文件已是最新，本次未重新处理；
+# encode_time为编码耗时（秒），output_bytes为输出文件大小
+ExportResult = namedtuple('ExportResult', ['index', 'input_path', 'output_path', 'success', 'error', 'elapsed',
+                                           'skipped', 'encode_time', 'output_bytes'], defaults=(False, 0.0, 0))
+
+# 增量导出时每记录多少个结果保存一次清单，中途中断后已完成的部分无需重做
+MANIFEST_SAVE_INTERVAL = 100
+
+
+def run_export_job(index, job):
+    """执行单个导出任务（在工作进程中运行，异常转换为失败结果）"""
+    start_time = time.perf_counter()
+    try:
+        processor = WatermarkProcessor.from_settings(job.settings)
+        encode_time = processor.apply_watermark_and_save(job.input_path, job.output_path, job.format_type,
+                                                         job.encoder_options)
+        return ExportResult(index, job.input_path, job.output_path, True, None,
+                            time.perf_counter() - start_time, False, encode_time, os.path.getsize(job.output_path))
+    except Exception as e:
+        return ExportResult(index, job.input_path, job.output_path, False, str(e),
+                            time.perf_counter() - start_time)
+
+
+class BatchExporter:
+    def __init__(self, max_workers=None):
+        # 工作进程数，None或小于1时使用CPU核心数
+        self.max_workers = self.resolve_worker_count(max_workers)
+        # 每个进程最多排队的任务数，限制同时在途的任务数量
+        self.queue_depth = 2
+
+    @staticmethod
+    def resolve_worker_count(max_workers=None):
+        """解析工作进程数"""
+        try:
+            max_workers = int(max_workers) if max_workers is not None else 0
+        except (TypeError, ValueError):
+            max_workers = 0
+        if max_workers < 1:
+            return os.cpu_count() or 1
+        return max_workers
+
+    def export(self, jobs, cancel_event=None, manifest=None, skip_up_to_date=True):
+        """批量导出图片，按任务提交顺序逐个产出ExportResult
+
+        cancel_event被设置后不再派发新任务，已在处理中的任务仍会产出结果；
+        传入ExportManifest时记录本次成功导出的结果，skip_up_to_date为True时跳过输出已是最新的任务
+        """
+        jobs = list(jobs)
+        if not jobs:
+            return
+
+        if manifest is None:
+            yield from self._export_pending(list(enumerate(jobs)), cancel_event)
+            return
+
+        # 先筛选出需要重新导出的任务，未变化的任务直接产出跳过结果
+        pending = []
+        skipped = deque()
+        for index, job in enumerate(jobs):
+            if skip_up_to_date and manifest.is_up_to_date(job):
+                skipped.append(ExportResult(index, job.input_path, job.output_path, True, None, 0.0, True, 0.0,
+                                            os.path.getsize(job.output_path)))
+            else:
+                pending.append((index, job))
+
+        recorded = 0
+        try:
+            for result in self._export_pending(pending, cancel_event):
+                # 保持整体按任务顺序产出
+                while skipped and skipped[0].index < result.index:
+                    yield skipped.popleft()
+                if result.success:
+                    manifest.record(jobs[result.index])
+                else:
+                    manifest.discard(jobs[result.index])
+                recorded += 1
+                if recorded % MANIFEST_SAVE_INTERVAL == 0:
+                    manifest.save()
+                yield result
+            if not (cancel_event is not None and cancel_event.is_set()):
+                while skipped:
+                    yield skipped.popleft()
+        finally:
+            manifest.save()
+
+    def _export_pending(self, pending, cancel_event=None):
+        """导出 (序号, 任务) 列表，按列表顺序产出结果"""
+        if not pending:
+            return
+
+        def cancelled():
+            return cancel_event is not None and cancel_event.is_set()
+
+        worker_count = min(self.max_workers, len(pending))
+
+        # 单进程时直接在当前进程中处理，避免进程池的启动开销
+        if worker_count == 1:
+            for index, job in pending:
+                if cancelled():
+                    return
+                yield run_export_job(index, job)
+            return
+
+        max_in_flight = worker_count * self.queue_depth
+        # 导出在后台线程中启动，此时预览渲染、缩略图加载等线程仍在运行；
+        # fork出的子进程可能继承被其他线程持有的锁而永久阻塞，因此使用spawn方式启动工作进程
+        with ProcessPoolExecutor(max_workers=worker_count,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = deque()
+            job_iter = iter(pending)
+
+            # 先填满在途任务队列
+            for index, job in job_iter:
+                futures.append(executor.submit(run_export_job, index, job))
+                if len(futures) >= max_in_flight:
+                    break
+
+            # 按顺序等待结果，每完成一个就补充提交一个新任务
+            while futures:
+                if cancelled():
+                    # 撤销尚未开始的任务，只等待正在处理的任务
+                    for future in futures:
+                        future.cancel()
+                future = futures.popleft()
+                if future.cancelled():
+                    continue
+                result = future.result()
+                if not cancelled():
+                    for index, job in job_iter:
+                        futures.append(executor.submit(run_export_job, index, job))
+                        break
+                yield result
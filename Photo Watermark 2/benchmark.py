@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+
+from PIL import Image
+
+from watermark_processor import WatermarkProcessor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def legacy_apply_watermark_and_save(processor, input_path, output_path):
+    """旧版导出流程：RGB转RGBA、整幅水印层混合、再转回RGB（仅用于对比）"""
+    with Image.open(input_path) as base_image:
+        base_image = base_image.convert('RGBA')
+        watermark = Image.new('RGBA', base_image.size, (255, 255, 255, 0))
+        sprite = processor._get_text_sprite(base_image.size)
+        watermark.paste(sprite.image, processor._calculate_sprite_position(base_image.size, sprite))
+        result = Image.alpha_composite(base_image, watermark)
+        result.convert('RGB').save(output_path, format='JPEG', quality=95, subsampling=0)
+
+
+def current_apply_watermark_and_save(processor, input_path, output_path):
+    """当前导出流程"""
+    processor.apply_watermark_and_save(input_path, output_path, 'jpeg')
+
+
+PIPELINES = {
+    'legacy': legacy_apply_watermark_and_save,
+    'current': current_apply_watermark_and_save,
+}
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB），不支持的平台返回None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS单位为字节，Linux为KB
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def run_pipeline(name, input_path, output_dir, count):
+    """在独立进程中运行指定流程，返回(每张平均耗时, 峰值内存)"""
+    processor = WatermarkProcessor()
+    processor.set_watermark_text("Benchmark 水印")
+    pipeline = PIPELINES[name]
+
+    # 预热一次，排除字体加载和文字渲染的首次开销
+    pipeline(processor, input_path, os.path.join(output_dir, f"{name}_warmup.jpg"))
+
+    start_time = time.perf_counter()
+    for i in range(count):
+        pipeline(processor, input_path, os.path.join(output_dir, f"{name}_{i}.jpg"))
+    elapsed = time.perf_counter() - start_time
+    return elapsed / count, peak_rss_mb()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='对比JPEG导出流程的耗时与峰值内存')
+    parser.add_argument('--size', default='6000x4000', help='测试图片尺寸，如 6000x4000')
+    parser.add_argument('--count', type=int, default=5, help='每个流程处理的次数')
+    args = parser.parse_args(argv)
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    work_dir = tempfile.mkdtemp(prefix='watermark_bench_')
+    try:
+        input_path = os.path.join(work_dir, 'input.jpg')
+        Image.effect_noise((width, height), 64).convert('RGB').save(input_path, quality=90)
+        print(f"测试图片: {width}x{height} JPEG, 每个流程 {args.count} 次")
+
+        for name in PIPELINES:
+            # 每个流程使用全新的进程，保证峰值内存互不影响
+            with multiprocessing.Pool(1) as pool:
+                per_image, peak = pool.apply(run_pipeline, (name, input_path, work_dir, args.count))
+            peak_text = f"{peak:.0f} MB" if peak is not None else "不可用"
+            print(f"  {name:8s} 每张 {per_image * 1000:.0f} ms, 峰值内存 {peak_text}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
@@ -2,6 +2,8 @@ import os
 import json
 import shutil
 
+from metadata_cache import MetadataCache
+
 class ConfigManager:
     def __init__(self):
         # 获取应用数据目录
@@ -10,6 +12,9 @@ class ConfigManager:
         self.config_file = os.path.join(self.app_data_dir, "config.json")
         # 模板文件夹
         self.templates_dir = os.path.join(self.app_data_dir, "templates")
+        # 图片元数据和缩略图缓存数据库
+        self.metadata_cache_file = os.path.join(self.app_data_dir, "metadata_cache.db")
+        self._metadata_cache = None
         
         # 确保目录存在
         self._ensure_directories()
@@ -62,9 +67,32 @@ class ConfigManager:
             "export_format": "JPEG",
             "naming_rule": "original",
             "prefix": "wm_",
-            "suffix": "_watermarked"
+            "suffix": "_watermarked",
+            "font_path": None,
+            "font_dirs": [],
+            "preview_cache_mb": 256,
+            "full_validation": False,
+            "dedupe_by_content": False,
+            "encoder_profile": "balanced",
+            "encoder_profiles": {}
         }
     
+    def get_metadata_cache(self):
+        """获取图片元数据缓存，第一次调用时打开数据库，失败时返回None"""
+        if self._metadata_cache is None:
+            try:
+                self._metadata_cache = MetadataCache(self.metadata_cache_file)
+            except Exception as e:
+                print(f"打开元数据缓存失败: {str(e)}")
+                return None
+        return self._metadata_cache
+    
+    def close_metadata_cache(self):
+        """关闭图片元数据缓存"""
+        if self._metadata_cache is not None:
+            self._metadata_cache.close()
+            self._metadata_cache = None
+    
     def save_template(self, template_name, template_data):
         """保存水印模板"""
         try:
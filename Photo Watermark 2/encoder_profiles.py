@@ -0,0 +1,69 @@
+# 导出编码方案：方案名 -> 输出格式 -> 编码参数（参数定义见encoder_registry中各编码器）
+# balanced与之前固定的编码参数相同，是默认方案
+ENCODER_PROFILES = {
+    'fast': {
+        # 4:2:0色度抽样、不做哈夫曼表优化，编码最快
+        'jpeg': {'quality': 85, 'subsampling': 2, 'optimize': False, 'progressive': False},
+        'png': {'compress_level': 1},
+        'webp': {'quality': 80, 'method': 0},
+        'tiff': {'compression': 'raw'},
+        'avif': {'quality': 60, 'speed': 10},
+    },
+    'balanced': {
+        'jpeg': {'quality': 95, 'subsampling': 0},
+        'png': {'compress_level': 1},
+        'webp': {'quality': 90, 'method': 4},
+        'tiff': {'compression': 'tiff_lzw'},
+        'avif': {'quality': 75, 'speed': 6},
+    },
+    'archival': {
+        # 最高画质，JPEG使用渐进式和优化哈夫曼表，PNG使用最高压缩级别，编码最慢
+        'jpeg': {'quality': 98, 'subsampling': 0, 'optimize': True, 'progressive': True},
+        'png': {'compress_level': 9, 'optimize': True},
+        # WebP无损压缩，quality在无损模式下表示压缩力度，取中等值避免编码过慢
+        'webp': {'quality': 50, 'lossless': True, 'method': 4},
+        'tiff': {'compression': 'tiff_adobe_deflate'},
+        'avif': {'quality': 90, 'speed': 2},
+    },
+}
+
+# 默认编码方案
+DEFAULT_PROFILE = 'balanced'
+
+# 界面中显示的方案名称
+PROFILE_LABELS = {
+    'fast': "快速（画质略低）",
+    'balanced': "均衡",
+    'archival': "存档（最高画质，编码最慢）",
+}
+
+
+def get_profiles(custom_profiles=None):
+    """获取所有编码方案，配置中的自定义方案（encoder_profiles）覆盖或补充内置方案"""
+    profiles = {name: {fmt: dict(options) for fmt, options in formats.items()}
+                for name, formats in ENCODER_PROFILES.items()}
+    for name, formats in (custom_profiles or {}).items():
+        if not isinstance(formats, dict):
+            continue
+        profile = profiles.setdefault(name, {})
+        for fmt, options in formats.items():
+            if isinstance(options, dict):
+                profile.setdefault(fmt.lower(), {}).update(options)
+    return profiles
+
+
+def resolve_profile_name(name, custom_profiles=None):
+    """检查方案名，不存在时退回默认方案"""
+    if name in get_profiles(custom_profiles):
+        return name
+    return DEFAULT_PROFILE
+
+
+def get_encoder_options(profile_name, format_type, custom_profiles=None):
+    """获取指定方案和输出格式的编码参数，方案中未定义该格式时使用默认方案的参数"""
+    profiles = get_profiles(custom_profiles)
+    profile = profiles.get(profile_name) or profiles[DEFAULT_PROFILE]
+    options = profile.get(format_type.lower())
+    if options is None:
+        options = profiles[DEFAULT_PROFILE].get(format_type.lower(), {})
+    return dict(options)
@@ -0,0 +1,143 @@
+from collections import namedtuple
+
+from PIL import Image, features
+
+# 编码参数定义：type为 'int'、'bool' 或 'choice'，int类型用min_value/max_value限定范围，choice类型从choices中选择
+EncoderOption = namedtuple('EncoderOption', ['name', 'type', 'default', 'min_value', 'max_value', 'choices'],
+                           defaults=(None, None, None))
+
+# 默认输出格式
+DEFAULT_ENCODER = 'jpeg'
+
+
+class Encoder:
+    """输出格式编码器：格式名、Pillow格式、扩展名和编码参数定义"""
+
+    def __init__(self, name, pil_format, extension, label, options, supports_alpha=True, available=None):
+        self.name = name
+        self.pil_format = pil_format
+        self.extension = extension
+        self.label = label
+        # 编码参数定义，参数名 -> EncoderOption
+        self.options = {option.name: option for option in options}
+        # 是否支持透明通道，不支持时保存前转换为RGB
+        self.supports_alpha = supports_alpha
+        # 检查当前Pillow是否支持该格式的函数，None表示总是可用
+        self._available = available
+
+    def is_available(self):
+        """当前环境的Pillow是否支持写入该格式"""
+        if self._available is None:
+            return True
+        try:
+            return bool(self._available())
+        except Exception:
+            return False
+
+    def default_options(self):
+        """所有参数的默认值"""
+        return {name: option.default for name, option in self.options.items()}
+
+    def validate_options(self, options=None):
+        """按参数定义校验编码参数：忽略未知参数，数值限制在范围内，非法取值使用默认值"""
+        validated = self.default_options()
+        for name, value in (options or {}).items():
+            option = self.options.get(name)
+            if option is None:
+                continue
+            try:
+                if option.type == 'bool':
+                    value = bool(value)
+                elif option.type == 'int':
+                    value = int(value)
+                    if option.min_value is not None:
+                        value = max(option.min_value, value)
+                    if option.max_value is not None:
+                        value = min(option.max_value, value)
+                elif option.type == 'choice' and value not in option.choices:
+                    continue
+            except (TypeError, ValueError):
+                continue
+            validated[name] = value
+        return validated
+
+    def save(self, image, output_path, options=None):
+        """按校验后的参数保存图片"""
+        if self.supports_alpha:
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        elif image.mode != 'RGB':
+            # 不支持透明度的格式转换为RGB
+            image = image.convert('RGB')
+        image.save(output_path, format=self.pil_format, **self.validate_options(options))
+
+
+def _pillow_can_save(pil_format):
+    """检查Pillow是否注册了该格式的写入插件"""
+    Image.init()
+    return pil_format in Image.SAVE
+
+
+def _avif_available():
+    """Pillow 11.2起内置AVIF支持，旧版本需要安装pillow-avif-plugin"""
+    try:
+        import pillow_avif  # noqa: F401  导入时向Pillow注册AVIF插件
+    except ImportError:
+        pass
+    return _pillow_can_save('AVIF')
+
+
+# 已注册的编码器，按注册顺序排列
+_encoders = {}
+
+
+def register_encoder(encoder):
+    """注册编码器，同名编码器会被替换"""
+    _encoders[encoder.name] = encoder
+    return encoder
+
+
+def get_encoder(name):
+    """按名称获取编码器（不区分大小写），不存在或当前环境不可用时抛出ValueError"""
+    encoder = _encoders.get((name or '').lower())
+    if encoder is None or not encoder.is_available():
+        raise ValueError(f"不支持的输出格式: {name}")
+    return encoder
+
+
+def available_encoders():
+    """当前环境可用的编码器列表"""
+    return [encoder for encoder in _encoders.values() if encoder.is_available()]
+
+
+register_encoder(Encoder('jpeg', 'JPEG', '.jpg', "JPEG", [
+    EncoderOption('quality', 'int', 95, 1, 100),
+    # 色度抽样：0为4:4:4，1为4:2:2，2为4:2:0
+    EncoderOption('subsampling', 'choice', 0, choices=(0, 1, 2)),
+    EncoderOption('optimize', 'bool', False),
+    EncoderOption('progressive', 'bool', False),
+], supports_alpha=False))
+
+register_encoder(Encoder('png', 'PNG', '.png', "PNG", [
+    EncoderOption('compress_level', 'int', 1, 0, 9),
+    EncoderOption('optimize', 'bool', False),
+]))
+
+register_encoder(Encoder('webp', 'WEBP', '.webp', "WebP", [
+    EncoderOption('quality', 'int', 90, 0, 100),
+    EncoderOption('lossless', 'bool', False),
+    # 压缩方法：0最快，6最慢但文件最小
+    EncoderOption('method', 'int', 4, 0, 6),
+], available=lambda: features.check('webp') and _pillow_can_save('WEBP')))
+
+register_encoder(Encoder('tiff', 'TIFF', '.tif', "TIFF", [
+    EncoderOption('compression', 'choice', 'tiff_lzw',
+                  choices=('raw', 'tiff_lzw', 'tiff_deflate', 'tiff_adobe_deflate')),
+]))
+
+# AVIF需要Pillow 11.2及以上版本或pillow-avif-plugin插件
+register_encoder(Encoder('avif', 'AVIF', '.avif', "AVIF", [
+    EncoderOption('quality', 'int', 75, 0, 100),
+    # 编码速度：0最慢，10最快
+    EncoderOption('speed', 'int', 6, 0, 10),
+], available=_avif_available))
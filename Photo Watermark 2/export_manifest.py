@@ -0,0 +1,119 @@
+import os
+import json
+import hashlib
+
+# 清单文件名，保存在输出文件夹中
+MANIFEST_FILENAME = ".photo_watermark_manifest.json"
+
+# 清单格式版本，水印绘制或编码方式变化时递增，使旧清单中的记录全部失效
+MANIFEST_VERSION = 1
+
+
+def source_fingerprint(path):
+    """源文件指纹：绝对路径、文件大小和修改时间，只需一次stat"""
+    stat = os.stat(path)
+    return [os.path.normcase(os.path.abspath(path)), stat.st_size, stat.st_mtime_ns]
+
+
+def settings_hash(settings, format_type, encoder_options=None):
+    """水印设置、输出格式和编码参数的哈希值，字体文件被替换时同样视为设置变化"""
+    values = dict(settings._asdict())
+    values['format_type'] = format_type
+    values['encoder_options'] = encoder_options
+    font_path = values.get('font_path')
+    if font_path:
+        try:
+            stat = os.stat(font_path)
+            values['font_file'] = [stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            values['font_file'] = None
+    data = json.dumps(values, sort_keys=True, ensure_ascii=False, default=list)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+class ExportManifest:
+    def __init__(self, output_dir):
+        # 记录每个输出文件由哪个源文件、哪组设置生成，再次导出时跳过未变化的图片
+        self.output_dir = output_dir
+        self.manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+        self.entries = {}
+        self._dirty = False
+        self.load()
+
+    def _entry_key(self, output_path):
+        """清单中以输出文件名作为键，输出文件夹整体移动后清单依然有效"""
+        return os.path.relpath(os.path.abspath(output_path), os.path.abspath(self.output_dir))
+
+    def load(self):
+        """读取清单，文件不存在、损坏或版本不一致时从空清单开始"""
+        self.entries = {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == MANIFEST_VERSION:
+            entries = data.get("entries")
+            if isinstance(entries, dict):
+                self.entries = entries
+
+    def save(self):
+        """保存清单，先写临时文件再替换，避免中断时留下损坏的清单"""
+        if not self._dirty:
+            return True
+        temp_path = self.manifest_path + ".tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": MANIFEST_VERSION, "entries": self.entries}, f, ensure_ascii=False)
+            os.replace(temp_path, self.manifest_path)
+            self._dirty = False
+            return True
+        except Exception as e:
+            print(f"保存导出清单失败: {str(e)}")
+            return False
+
+    def owned_names(self):
+        """上次导出的输出文件名 -> 源文件键，用于重新导出时复用同一源文件的输出文件名"""
+        owned = {}
+        for name, entry in self.entries.items():
+            source = entry.get("source") if isinstance(entry, dict) else None
+            if source:
+                owned[name] = source[0]
+        return owned
+
+    def is_up_to_date(self, job):
+        """判断导出任务的输出文件是否已由相同的源文件和设置生成，且之后未被修改或删除"""
+        entry = self.entries.get(self._entry_key(job.output_path))
+        if entry is None:
+            return False
+        try:
+            output_stat = os.stat(job.output_path)
+            if entry.get("output") != [output_stat.st_size, output_stat.st_mtime_ns]:
+                return False
+            if entry.get("source") != source_fingerprint(job.input_path):
+                return False
+        except OSError:
+            return False
+        return entry.get("settings") == settings_hash(job.settings, job.format_type, job.encoder_options)
+
+    def record(self, job):
+        """记录成功导出的任务"""
+        try:
+            output_stat = os.stat(job.output_path)
+            entry = {
+                "source": source_fingerprint(job.input_path),
+                "settings": settings_hash(job.settings, job.format_type, job.encoder_options),
+                "output": [output_stat.st_size, output_stat.st_mtime_ns],
+            }
+        except OSError:
+            self.discard(job)
+            return
+        self.entries[self._entry_key(job.output_path)] = entry
+        self._dirty = True
+
+    def discard(self, job):
+        """使任务对应的记录失效（导出失败时调用），保留源文件归属以便下次复用同一文件名重新导出"""
+        entry = self.entries.get(self._entry_key(job.output_path))
+        if entry is not None and entry.get("settings") is not None:
+            entry["settings"] = None
+            self._dirty = True
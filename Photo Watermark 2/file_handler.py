@@ -1,6 +1,128 @@
 import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
-import tkinter as tk
+
+from metadata_cache import read_metadata
+from image_collection import ScannedFile
+from encoder_registry import DEFAULT_ENCODER, available_encoders, get_encoder
+
+# 文件头魔数与图片格式的对应关系
+MAGIC_SIGNATURES = [
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'BM', 'BMP'),
+    (b'II*\x00', 'TIFF'),
+    (b'MM\x00*', 'TIFF'),
+]
+
+# 只解析文件头得到的图片信息
+ImageInfo = namedtuple('ImageInfo', ['path', 'format', 'width', 'height'])
+
+
+class OutputNamePlanner:
+    """批量规划输出文件名：只列一次输出目录，在内存中解决重名，并用O_EXCL原子地占用文件名"""
+    
+    def __init__(self, output_dir, owned_names=None):
+        self.output_dir = output_dir
+        # 输出目录中已存在的文件名（统一小写比较，兼容不区分大小写的文件系统）
+        try:
+            self._existing = {name.lower() for name in os.listdir(output_dir)}
+        except OSError:
+            self._existing = set()
+        # 上次导出时由某个源文件生成的文件名：小写文件名 -> 源文件键，同一源文件可以覆盖自己的旧输出
+        self._owners = {}
+        self._owned_by_source = {}
+        for name, source_key in (owned_names or {}).items():
+            self._owners[name.lower()] = source_key
+            self._owned_by_source.setdefault(source_key, []).append(name)
+        # 本批次已分配的文件名，以及每个基础文件名下一个可尝试的数字后缀
+        self._reserved = set()
+        self._counters = {}
+        # 本批次为占用文件名而新建的空文件，导出失败或取消时需要清理
+        self.placeholders = set()
+    
+    @staticmethod
+    def source_key(source_path):
+        """源文件键：规范化的绝对路径"""
+        return os.path.normcase(os.path.abspath(source_path))
+    
+    def _owned_candidate(self, source_key, filename):
+        """查找该源文件上次使用的、与filename同名或带数字后缀的文件名"""
+        name, ext = os.path.splitext(filename)
+        for owned in self._owned_by_source.get(source_key, ()):
+            owned_name, owned_ext = os.path.splitext(owned)
+            if owned_ext.lower() != ext.lower() or owned.lower() in self._reserved:
+                continue
+            if owned_name.lower() == name.lower():
+                return owned
+            head, _, counter = owned_name.rpartition('_')
+            if head.lower() == name.lower() and counter.isdigit():
+                return owned
+        return None
+    
+    def _is_free(self, candidate, source_key):
+        """文件名在本批次未被占用，且目录中不存在或属于同一源文件"""
+        key = candidate.lower()
+        if key in self._reserved:
+            return False
+        return key not in self._existing or self._owners.get(key) == source_key
+    
+    def plan(self, source_path, filename):
+        """为源文件分配输出文件名并占用，返回完整输出路径"""
+        source_key = self.source_key(source_path)
+        owned = self._owned_candidate(source_key, filename)
+        if owned is not None:
+            self._reserved.add(owned.lower())
+            return os.path.join(self.output_dir, owned)
+        
+        name, ext = os.path.splitext(filename)
+        base_key = filename.lower()
+        candidate = filename
+        counter = self._counters.get(base_key, 0)
+        while True:
+            if counter:
+                candidate = f"{name}_{counter}{ext}"
+            counter += 1
+            if not self._is_free(candidate, source_key):
+                continue
+            if self._reserve(candidate, source_key):
+                break
+        self._counters[base_key] = counter
+        return os.path.join(self.output_dir, candidate)
+    
+    def _reserve(self, candidate, source_key):
+        """原子地占用文件名，文件已被其他进程创建时返回False"""
+        key = candidate.lower()
+        self._reserved.add(key)
+        if key in self._existing:
+            # 覆盖同一源文件的旧输出，无需新建
+            return True
+        path = os.path.join(self.output_dir, candidate)
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666)
+        except FileExistsError:
+            self._existing.add(key)
+            return False
+        except OSError:
+            # 无法预先创建（如目录不可写），交给导出时报告错误
+            return True
+        os.close(fd)
+        self.placeholders.add(path)
+        return True
+    
+    def release(self, output_paths):
+        """删除仍为空文件的占位文件（对应的图片导出失败或被取消）"""
+        for path in output_paths:
+            if path not in self.placeholders:
+                continue
+            try:
+                if os.path.getsize(path) == 0:
+                    os.remove(path)
+            except OSError:
+                pass
+            self.placeholders.discard(path)
 
 class FileHandler:
     def __init__(self):
@@ -9,53 +131,185 @@ class FileHandler:
             '.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif'
         }
         
-        # 输出格式映射
+        # 输出格式映射，由编码器注册表中当前环境可用的编码器生成
         self.output_formats = {
-            'jpeg': ('JPEG', '.jpg'),
-            'png': ('PNG', '.png')
+            encoder.name: (encoder.pil_format, encoder.extension) for encoder in available_encoders()
         }
+        
+        # 是否在导入时完整校验图片数据，默认只解析文件头，完整解码留到导出时进行
+        self.full_validation = False
+        # 批量校验使用的线程数
+        self.validation_workers = min(8, (os.cpu_count() or 1) * 2)
+        # 持久化的图片元数据缓存（MetadataCache），设置后已导入过且未修改的文件只需一次stat
+        self.metadata_cache = None
+    
+    def sniff_format(self, file_path):
+        """根据文件头魔数判断图片格式，无法识别时返回None"""
+        try:
+            with open(file_path, 'rb') as f:
+                header = f.read(16)
+        except OSError:
+            return None
+        for signature, format_name in MAGIC_SIGNATURES:
+            if header.startswith(signature):
+                return format_name
+        return None
+    
+    def read_image_header(self, file_path):
+        """只读取文件头获取图片格式和尺寸，不解码像素数据，无效时返回None"""
+        metadata_cache = self.metadata_cache
+        if metadata_cache is not None:
+            metadata = metadata_cache.lookup(file_path)
+            if metadata is not None:
+                return ImageInfo(file_path, metadata.format, metadata.width, metadata.height)
+        
+        if self.sniff_format(file_path) is None:
+            return None
+        try:
+            if metadata_cache is not None:
+                # 解析文件头和EXIF并写入缓存，下次导入时无需再打开文件
+                metadata = read_metadata(file_path)
+                try:
+                    metadata_cache.store(metadata)
+                except Exception as e:
+                    print(f"写入元数据缓存失败: {str(e)}")
+                return ImageInfo(file_path, metadata.format, metadata.width, metadata.height)
+            # Image.open只解析文件头，像素数据在load()时才会读取
+            with Image.open(file_path) as img:
+                return ImageInfo(file_path, img.format, img.width, img.height)
+        except Exception:
+            return None
     
-    def validate_image(self, file_path):
+    def validate_image(self, file_path, full_validation=None):
         """验证单个图片文件是否有效"""
-        if not os.path.exists(file_path):
-            return False
+        if full_validation is None:
+            full_validation = self.full_validation
         
         # 检查文件扩展名
         _, ext = os.path.splitext(file_path.lower())
         if ext not in self.supported_formats:
             return False
         
-        # 尝试打开图片以验证其有效性
+        # 快速模式：检查魔数并解析文件头
+        if self.read_image_header(file_path) is None:
+            return False
+        if not full_validation:
+            return True
+        
+        # 完整模式：读取全部数据以验证图片的有效性
         try:
             with Image.open(file_path) as img:
-                img.verify()  # 验证图片的有效性
+                img.verify()
             return True
         except Exception:
             return False
     
-    def validate_images(self, file_paths):
-        """批量验证图片文件"""
-        valid_images = []
-        for file_path in file_paths:
-            if self.validate_image(file_path):
-                valid_images.append(file_path)
-        return valid_images
+    def validate_images(self, file_paths, full_validation=None):
+        """批量验证图片文件，多个文件时并行校验，结果保持原有顺序"""
+        file_paths = list(file_paths)
+        if len(file_paths) <= 1 or self.validation_workers <= 1:
+            valid_paths = [path for path in file_paths if self.validate_image(path, full_validation)]
+        else:
+            with ThreadPoolExecutor(max_workers=self.validation_workers) as executor:
+                results = executor.map(lambda path: self.validate_image(path, full_validation), file_paths)
+                valid_paths = [path for path, valid in zip(file_paths, results) if valid]
+        self.flush_metadata_cache()
+        return valid_paths
+    
+    def flush_metadata_cache(self):
+        """提交元数据缓存中尚未保存的写入"""
+        if self.metadata_cache is None:
+            return
+        try:
+            self.metadata_cache.flush()
+        except Exception as e:
+            print(f"保存元数据缓存失败: {str(e)}")
     
     def get_image_files_from_folder(self, folder_path):
         """从文件夹中获取所有有效的图片文件"""
         image_files = []
+        for batch in self.iter_image_batches(folder_path):
+            image_files.extend(scanned.path for scanned in batch)
+        return image_files
+    
+    def iter_image_candidates(self, folder_path, cancel_event=None):
+        """用os.scandir递归遍历文件夹，逐个产出扩展名受支持的文件（ScannedFile）"""
+        pending_dirs = [folder_path]
+        while pending_dirs:
+            current_dir = pending_dirs.pop()
+            try:
+                with os.scandir(current_dir) as entries:
+                    sub_dirs = []
+                    for entry in entries:
+                        if cancel_event is not None and cancel_event.is_set():
+                            return
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                sub_dirs.append(entry.path)
+                                continue
+                            if not entry.is_file():
+                                continue
+                        except OSError:
+                            continue
+                        _, ext = os.path.splitext(entry.name.lower())
+                        if ext in self.supported_formats:
+                            # 是否为符号链接由目录项直接得到，不需要额外的lstat
+                            yield ScannedFile(entry.path, entry.is_symlink())
+            except OSError:
+                # 无权限或已被删除的目录直接跳过
+                continue
+            # 逆序入栈，使子目录按目录顺序处理
+            pending_dirs.extend(reversed(sub_dirs))
+    
+    def iter_image_batches(self, folder_path, batch_size=64, max_interval=0.2, cancel_event=None):
+        """流式导入：边遍历边并行校验，分批产出有效图片（ScannedFile，保持遍历顺序）
         
+        每批最多batch_size个文件，距上一批超过max_interval秒时即使未满也会产出
+        """
         if not os.path.isdir(folder_path):
-            return image_files
+            return
         
-        # 遍历文件夹
-        for root, _, files in os.walk(folder_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                if self.validate_image(file_path):
-                    image_files.append(file_path)
+        def cancelled():
+            return cancel_event is not None and cancel_event.is_set()
         
-        return image_files
+        max_in_flight = max(1, self.validation_workers) * 4
+        batch = []
+        last_yield = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, self.validation_workers)) as executor:
+                futures = deque()
+                candidates = self.iter_image_candidates(folder_path, cancel_event)
+                exhausted = False
+                while futures or not exhausted:
+                    # 补充在途校验任务
+                    while not exhausted and len(futures) < max_in_flight:
+                        scanned = next(candidates, None)
+                        if scanned is None:
+                            exhausted = True
+                            break
+                        futures.append((scanned, executor.submit(self.validate_image, scanned.path)))
+                
+                    if cancelled():
+                        for _, future in futures:
+                            future.cancel()
+                        return
+                    if not futures:
+                        break
+                
+                    scanned, future = futures.popleft()
+                    if future.result():
+                        batch.append(scanned)
+                
+                    now = time.perf_counter()
+                    if batch and (len(batch) >= batch_size or now - last_yield >= max_interval):
+                        yield batch
+                        batch = []
+                        last_yield = now
+        finally:
+            # 取消导入或调用方提前结束时同样提交已解析的元数据，避免最多COMMIT_INTERVAL条记录丢失
+            self.flush_metadata_cache()
+        if batch and not cancelled():
+            yield batch
     
     def get_drop_files(self, event):
         """获取拖拽到窗口的文件列表"""
@@ -116,15 +370,36 @@ class FileHandler:
         
         return safe_filename
     
-    def get_unique_filename(self, directory, filename):
-        """获取唯一的文件名，如果文件已存在则添加数字后缀"""
-        if not os.path.exists(os.path.join(directory, filename)):
-            return filename
+    def get_output_filename(self, original_path, naming_rule="original", prefix="wm_", suffix="_watermarked", export_format="jpeg"):
+        """根据命名规则和输出格式获取输出文件名"""
+        original_name = os.path.basename(original_path)
+        name_without_ext, _ = os.path.splitext(original_name)
         
-        name, ext = os.path.splitext(filename)
-        counter = 1
+        # 根据命名规则生成新文件名
+        if naming_rule == "prefix":
+            new_name = f"{prefix}{name_without_ext}"
+        elif naming_rule == "suffix":
+            new_name = f"{name_without_ext}{suffix}"
+        else:
+            new_name = name_without_ext
         
-        while os.path.exists(os.path.join(directory, f"{name}_{counter}{ext}")):
-            counter += 1
+        # 添加输出格式的扩展名，由编码器注册表决定
+        try:
+            output_ext = get_encoder(export_format).extension
+        except ValueError:
+            output_ext = get_encoder(DEFAULT_ENCODER).extension
+        return self.get_safe_filename(f"{new_name}{output_ext}")
+    
+    def plan_output_paths(self, input_paths, output_dir, naming_rule="original", prefix="wm_",
+                          suffix="_watermarked", export_format="jpeg", owned_names=None):
+        """批量生成互不冲突的输出路径，返回 (输出路径列表, OutputNamePlanner)
         
-        return f"{name}_{counter}{ext}"
\ No newline at end of file
+        owned_names为 文件名 -> 源文件键 的映射（来自导出清单），同一源文件的旧输出会被复用覆盖，
+        其他已存在的文件和本批次中重名的文件依次添加 _1、_2 等数字后缀
+        """
+        planner = OutputNamePlanner(output_dir, owned_names)
+        output_paths = [
+            planner.plan(path, self.get_output_filename(path, naming_rule, prefix, suffix, export_format))
+            for path in input_paths
+        ]
+        return output_paths, planner
\ No newline at end of file
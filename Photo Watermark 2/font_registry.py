@@ -0,0 +1,162 @@
+import os
+import sys
+import threading
+
+from PIL import ImageFont
+
+from lru_cache import LRUCache
+
+# 按优先级排列的候选字体文件名，优先选择支持中文的字体
+DEFAULT_FONT_FILES = [
+    # Windows
+    'simhei.ttf', 'msyh.ttc', 'msyh.ttf', 'simsun.ttc', 'simkai.ttf',
+    # macOS
+    'PingFang.ttc', 'STHeiti Medium.ttc', 'Hiragino Sans GB.ttc', 'Arial Unicode.ttf',
+    # Linux
+    'wqy-microhei.ttc', 'wqy-zenhei.ttc', 'NotoSansCJK-Regular.ttc', 'NotoSansSC-Regular.otf',
+    'SourceHanSansSC-Regular.otf', 'DroidSansFallbackFull.ttf',
+    # 不支持中文的通用字体
+    'arial.ttf', 'DejaVuSans.ttf', 'LiberationSans-Regular.ttf',
+]
+
+# 可识别的字体文件扩展名
+FONT_EXTENSIONS = {'.ttf', '.ttc', '.otf', '.otc'}
+
+
+def get_system_font_dirs():
+    """获取当前系统的字体目录"""
+    home = os.path.expanduser("~")
+    if os.name == 'nt':
+        font_dirs = [os.path.join(os.environ.get('WINDIR', 'C:\\Windows'), 'Fonts')]
+        local_app_data = os.environ.get('LOCALAPPDATA')
+        if local_app_data:
+            font_dirs.append(os.path.join(local_app_data, 'Microsoft', 'Windows', 'Fonts'))
+    elif sys.platform == 'darwin':
+        font_dirs = ['/System/Library/Fonts', '/Library/Fonts', os.path.join(home, 'Library', 'Fonts')]
+    else:
+        # fontconfig默认搜索的目录
+        data_home = os.environ.get('XDG_DATA_HOME', os.path.join(home, '.local', 'share'))
+        font_dirs = [
+            '/usr/share/fonts',
+            '/usr/local/share/fonts',
+            os.path.join(data_home, 'fonts'),
+            os.path.join(home, '.fonts'),
+        ]
+    return font_dirs
+
+
+class FontRegistry:
+    def __init__(self, font_dirs=None, preferred_fonts=None):
+        # 字体搜索目录和优先字体列表
+        self.font_dirs = list(font_dirs) if font_dirs is not None else get_system_font_dirs()
+        self.preferred_fonts = list(preferred_fonts) if preferred_fonts is not None else list(DEFAULT_FONT_FILES)
+
+        self._lock = threading.RLock()
+        self._font_files = None  # 小写文件名 -> 字体文件路径
+        self._default_path = None
+        self._default_resolved = False
+        # 已加载的字体对象，按 (路径, 字号) 缓存
+        self._fonts = LRUCache(max_bytes=None, max_entries=128)
+
+    def add_font_dirs(self, font_dirs):
+        """添加额外的字体目录（如配置中的自定义目录）"""
+        with self._lock:
+            changed = False
+            for font_dir in font_dirs or []:
+                font_dir = os.path.expanduser(font_dir)
+                if font_dir not in self.font_dirs:
+                    self.font_dirs.insert(0, font_dir)
+                    changed = True
+            if changed:
+                # 重新扫描并重新选择默认字体
+                self._font_files = None
+                self._default_resolved = False
+
+    def _scan(self):
+        """扫描所有字体目录，只在第一次使用时执行"""
+        with self._lock:
+            if self._font_files is not None:
+                return self._font_files
+            font_files = {}
+            for font_dir in self.font_dirs:
+                if not os.path.isdir(font_dir):
+                    continue
+                for root, _, files in os.walk(font_dir):
+                    for filename in files:
+                        if os.path.splitext(filename)[1].lower() in FONT_EXTENSIONS:
+                            # 同名字体以先扫描到的目录为准
+                            font_files.setdefault(filename.lower(), os.path.join(root, filename))
+            self._font_files = font_files
+            return font_files
+
+    def find_font(self, name):
+        """根据字体文件路径或文件名查找字体，找不到时返回None"""
+        if not name:
+            return None
+        if os.path.isfile(name):
+            return name
+        return self._scan().get(os.path.basename(name).lower())
+
+    def available_fonts(self):
+        """获取所有可用字体，返回按文件名排序的 (文件名, 路径) 列表"""
+        return sorted((os.path.basename(path), path) for path in self._scan().values())
+
+    def resolve_default_path(self):
+        """选择第一个可用的优先字体，结果只计算一次"""
+        with self._lock:
+            if self._default_resolved:
+                return self._default_path
+            self._default_path = None
+            for name in self.preferred_fonts:
+                font_path = self.find_font(name)
+                if font_path is None:
+                    continue
+                try:
+                    ImageFont.truetype(font_path, 10)
+                except Exception:
+                    continue
+                self._default_path = font_path
+                break
+            if self._default_path is None:
+                print("警告：无法加载中文字体，可能导致中文显示异常")
+            self._default_resolved = True
+            return self._default_path
+
+    def get_font(self, font_path, font_size):
+        """获取指定字体和字号的字体对象，font_path为空时使用默认字体"""
+        resolved_path = self.find_font(font_path) if font_path else None
+        if resolved_path is None:
+            resolved_path = self.resolve_default_path()
+
+        key = (resolved_path, font_size)
+        font = self._fonts.get(key)
+        if font is None:
+            font = self._load(resolved_path, font_size)
+            self._fonts.put(key, font)
+        return font
+
+    def _load(self, font_path, font_size):
+        """加载字体文件，失败时退回Pillow内置字体"""
+        if font_path is not None:
+            try:
+                return ImageFont.truetype(font_path, font_size)
+            except Exception as e:
+                print(f"加载字体时出错: {str(e)}")
+        try:
+            # Pillow 10.1及以上版本的内置字体支持指定字号
+            return ImageFont.load_default(size=font_size)
+        except TypeError:
+            return ImageFont.load_default()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_font_registry():
+    """获取进程内共享的字体注册表"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = FontRegistry()
+        return _registry
@@ -0,0 +1,130 @@
+import os
+import hashlib
+from collections import namedtuple
+
+# 默认水印位置（中心）
+DEFAULT_POSITION = (0.5, 0.5)
+
+# 内容指纹读取的首尾字节数
+FINGERPRINT_CHUNK = 64 * 1024
+
+# 遍历文件夹得到的文件：is_symlink来自os.scandir的目录项，添加时无需再次访问文件系统判断符号链接
+ScannedFile = namedtuple('ScannedFile', ['path', 'is_symlink'])
+
+
+class ImageEntry:
+    __slots__ = ('path', 'key', 'position')
+
+    def __init__(self, path, key, position=DEFAULT_POSITION):
+        self.path = path
+        # 规范化后的真实路径，用于去重
+        self.key = key
+        # 该图片单独保存的水印位置
+        self.position = tuple(position)
+
+
+class ImageCollection:
+    def __init__(self, dedupe_by_content=False):
+        # 按导入顺序存储的图片条目
+        self._entries = []
+        # 规范化真实路径 -> 条目序号
+        self._index = {}
+        # 原始绝对路径 -> 条目序号，完全相同的路径无需访问文件系统即可判重
+        self._raw_index = {}
+        # 目录 -> 解析符号链接后的真实目录，同一目录下的文件只需解析一次
+        self._real_dirs = {}
+        # 是否额外按文件内容去重（需要读取文件首尾数据）
+        self.dedupe_by_content = dedupe_by_content
+        # 内容指纹 -> 条目序号
+        self._content_index = {}
+
+    def normalize_path(self, path, is_symlink=None):
+        """规范化路径：解析符号链接并统一大小写，使同一文件的不同写法得到相同的键
+
+        is_symlink为None时通过lstat判断文件本身是否为符号链接
+        """
+        directory, name = os.path.split(os.path.abspath(path))
+        real_dir = self._real_dirs.get(directory)
+        if real_dir is None:
+            real_dir = os.path.realpath(directory)
+            self._real_dirs[directory] = real_dir
+        real_path = os.path.join(real_dir, name)
+        # 文件本身是符号链接时单独解析
+        if is_symlink is None:
+            is_symlink = os.path.islink(real_path)
+        if is_symlink:
+            real_path = os.path.realpath(real_path)
+        return os.path.normcase(real_path)
+
+    @staticmethod
+    def content_fingerprint(path):
+        """计算文件内容指纹：文件大小加首尾数据的哈希"""
+        size = os.path.getsize(path)
+        digest = hashlib.sha1(str(size).encode('ascii'))
+        with open(path, 'rb') as f:
+            digest.update(f.read(FINGERPRINT_CHUNK))
+            if size > FINGERPRINT_CHUNK:
+                f.seek(max(FINGERPRINT_CHUNK, size - FINGERPRINT_CHUNK))
+                digest.update(f.read(FINGERPRINT_CHUNK))
+        return digest.hexdigest()
+
+    def add(self, path, position=DEFAULT_POSITION, is_symlink=None):
+        """添加图片，已存在（同一文件）时返回False"""
+        raw_key = os.path.normcase(os.path.abspath(path))
+        if raw_key in self._raw_index:
+            return False
+        key = self.normalize_path(path, is_symlink)
+        if key in self._index:
+            self._raw_index[raw_key] = self._index[key]
+            return False
+
+        fingerprint = None
+        if self.dedupe_by_content:
+            try:
+                fingerprint = self.content_fingerprint(path)
+            except OSError:
+                fingerprint = None
+            if fingerprint is not None and fingerprint in self._content_index:
+                return False
+
+        self._index[key] = len(self._entries)
+        self._raw_index[raw_key] = len(self._entries)
+        if fingerprint is not None:
+            self._content_index[fingerprint] = len(self._entries)
+        self._entries.append(ImageEntry(path, key, position))
+        return True
+
+    def add_many(self, paths):
+        """批量添加图片（路径或ScannedFile），返回实际新增的路径列表"""
+        added = []
+        for item in paths:
+            if isinstance(item, ScannedFile):
+                if self.add(item.path, is_symlink=item.is_symlink):
+                    added.append(item.path)
+            elif self.add(item):
+                added.append(item)
+        return added
+
+    def get_position(self, index):
+        """获取指定序号图片的水印位置"""
+        return self._entries[index].position
+
+    def set_position(self, index, position):
+        """设置指定序号图片的水印位置"""
+        self._entries[index].position = tuple(position)
+
+    def entries(self):
+        """按导入顺序遍历所有图片条目"""
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, index):
+        return self._entries[index].path
+
+    def __iter__(self):
+        return (entry.path for entry in self._entries)
+
+    def __contains__(self, path):
+        return self.normalize_path(path) in self._index
@@ -0,0 +1,99 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    def __init__(self, max_bytes, max_entries=None, sizeof=None):
+        # 内存预算（字节）和可选的条目数上限
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        # 计算单个缓存值占用字节数的函数
+        self.sizeof = sizeof or (lambda value: 0)
+
+        self._items = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """获取缓存值，命中时将其标记为最近使用"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value):
+        """写入缓存值，超出预算时淘汰最久未使用的条目"""
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._items:
+                self.current_bytes -= self._items.pop(key)[1]
+
+            # 单个值超过总预算时不缓存
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+
+            self._items[key] = (value, size)
+            self.current_bytes += size
+            self._evict()
+
+    def get_or_create(self, key, factory):
+        """获取缓存值，未命中时调用factory生成并写入缓存"""
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def resize(self, max_bytes=None, max_entries=None):
+        """调整内存预算并立即淘汰超出部分"""
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if max_entries is not None:
+                self.max_entries = max_entries
+            self._evict()
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._items.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """获取缓存统计信息"""
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def _evict(self):
+        """淘汰最久未使用的条目直到满足预算（调用方需持有锁）"""
+        while self._items and (
+            (self.max_bytes is not None and self.current_bytes > self.max_bytes)
+            or (self.max_entries is not None and len(self._items) > self.max_entries)
+        ):
+            _, (_, size) = self._items.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
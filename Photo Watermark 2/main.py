@@ -2,6 +2,10 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
 import sys
+import multiprocessing
+import threading
+import queue
+import time
 from PIL import Image, ImageTk
 import json
 
@@ -10,6 +14,16 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from file_handler import FileHandler
 from watermark_processor import WatermarkProcessor
 from config_manager import ConfigManager
+from batch_exporter import BatchExporter, ExportJob
+from export_manifest import ExportManifest
+from encoder_registry import available_encoders
+from encoder_profiles import DEFAULT_PROFILE, PROFILE_LABELS, get_profiles, get_encoder_options, resolve_profile_name
+from font_registry import get_font_registry
+from preview_engine import PreviewEngine, PreviewRenderer, PreviewRequest
+from render_scheduler import RenderScheduler
+from image_collection import ImageCollection
+from thumbnail_cache import ThumbnailCache
+from thumbnail_grid import ThumbnailGrid
 
 class WatermarkApp:
     def __init__(self, root):
@@ -22,17 +36,37 @@ class WatermarkApp:
         self.file_handler = FileHandler()
         self.watermark_processor = WatermarkProcessor()
         self.config_manager = ConfigManager()
+        # 持久化的元数据和缩略图缓存，重复导入同一文件夹时无需重新解析图片
+        self.metadata_cache = self.config_manager.get_metadata_cache()
+        self.file_handler.metadata_cache = self.metadata_cache
+        self.preview_engine = PreviewEngine()
+        # 预览在后台线程中渲染，界面线程只负责显示
+        self.preview_renderer = PreviewRenderer(self.preview_engine)
+        self.last_submitted_generation = 0
+        self.last_finished_generation = 0
+        self.displayed_generation = 0
+        self.preview_polling = False
+        self.placeholder_after_id = None
+        # 合并短时间内的多次预览请求
+        self.preview_scheduler = RenderScheduler(self.root, self.render_preview)
+        self.last_canvas_size = None
         
         # 存储变量
-        self.imported_images = []
+        # 已导入图片：有序存储并按规范化真实路径建立索引，每张图片的水印位置保存在条目中
+        self.imported_images = ImageCollection()
         self.current_image_index = -1
         self.preview_image = None
         self.preview_photo = None
         self.dragging_watermark = False
         self.watermark_x = 0
         self.watermark_y = 0
-        # 为每个图片单独存储水印位置
-        self.image_watermark_positions = {}
+        # 后台导出状态
+        self.export_cancel_event = None
+        self.export_queue = None
+        # 后台文件夹导入状态
+        self.import_cancel_event = None
+        self.import_queue = None
+        self.import_found = 0
         
         # 先创建UI，确保所有变量都已初始化
         self.create_ui()
@@ -61,8 +95,15 @@ class WatermarkApp:
         file_frame.pack(fill=tk.X, padx=5, pady=5)
         
         ttk.Button(file_frame, text="导入图片", command=self.import_images).pack(fill=tk.X, padx=5, pady=2)
-        ttk.Button(file_frame, text="导入文件夹", command=self.import_folder).pack(fill=tk.X, padx=5, pady=2)
-        ttk.Button(file_frame, text="导出图片", command=self.export_images).pack(fill=tk.X, padx=5, pady=2)
+        self.import_folder_button = ttk.Button(file_frame, text="导入文件夹", command=self.import_folder)
+        self.import_folder_button.pack(fill=tk.X, padx=5, pady=2)
+        self.export_button = ttk.Button(file_frame, text="导出图片", command=self.export_images)
+        self.export_button.pack(fill=tk.X, padx=5, pady=2)
+        
+        # 文件夹导入进度（导入时才显示取消按钮）
+        self.import_status_label = ttk.Label(file_frame, text="")
+        self.import_status_label.pack(anchor=tk.W, padx=5)
+        self.import_cancel_button = ttk.Button(file_frame, text="取消导入", command=self.cancel_import)
         
         # 水印设置部分
         watermark_frame = ttk.LabelFrame(control_frame, text="水印设置", padding="5")
@@ -73,10 +114,17 @@ class WatermarkApp:
         self.watermark_text_var = tk.StringVar(value=self.watermark_processor.watermark_text)
         ttk.Entry(watermark_frame, textvariable=self.watermark_text_var).pack(fill=tk.X, padx=5, pady=2)
         
+        # 字体
+        ttk.Label(watermark_frame, text="字体:").pack(anchor=tk.W, padx=5, pady=2)
+        self.font_var = tk.StringVar(value="自动")
+        self.font_combobox = ttk.Combobox(watermark_frame, textvariable=self.font_var, state="readonly")
+        self.font_combobox.pack(fill=tk.X, padx=5, pady=2)
+        self.font_combobox.bind("<<ComboboxSelected>>", self.on_font_select)
+        
         # 透明度
         ttk.Label(watermark_frame, text="透明度:").pack(anchor=tk.W, padx=5, pady=2)
         self.opacity_var = tk.IntVar(value=self.watermark_processor.opacity)
-        opacity_scale = ttk.Scale(watermark_frame, from_=0, to=100, orient=tk.HORIZONTAL, variable=self.opacity_var, command=self.update_preview)
+        opacity_scale = ttk.Scale(watermark_frame, from_=0, to=100, orient=tk.HORIZONTAL, variable=self.opacity_var, command=lambda value: self.update_preview(fast=True))
         opacity_scale.pack(fill=tk.X, padx=5, pady=2)
         self.opacity_label = ttk.Label(watermark_frame, text=f"{self.opacity_var.get()}%")
         self.opacity_label.pack(anchor=tk.W, padx=5)
@@ -104,8 +152,9 @@ class WatermarkApp:
         self.export_format_var = tk.StringVar(value="JPEG")
         format_frame = ttk.Frame(export_frame)
         format_frame.pack(fill=tk.X, padx=5, pady=2)
-        ttk.Radiobutton(format_frame, text="JPEG", variable=self.export_format_var, value="JPEG").pack(side=tk.LEFT, padx=5)
-        ttk.Radiobutton(format_frame, text="PNG", variable=self.export_format_var, value="PNG").pack(side=tk.LEFT, padx=5)
+        # 可选格式来自编码器注册表（WebP、AVIF取决于当前Pillow是否支持）
+        for encoder in available_encoders():
+            ttk.Radiobutton(format_frame, text=encoder.label, variable=self.export_format_var, value=encoder.name.upper()).pack(side=tk.LEFT, padx=2)
         
         ttk.Label(export_frame, text="命名规则:").pack(anchor=tk.W, padx=5, pady=2)
         self.naming_rule_var = tk.StringVar(value="original")
@@ -123,6 +172,29 @@ class WatermarkApp:
         self.suffix_var = tk.StringVar(value="_watermarked")
         ttk.Entry(naming_frame, textvariable=self.suffix_var, width=10).pack(side=tk.LEFT, padx=2)
         
+        # 并行导出进程数
+        workers_frame = ttk.Frame(export_frame)
+        workers_frame.pack(fill=tk.X, padx=5, pady=2)
+        ttk.Label(workers_frame, text="并行进程数:").pack(side=tk.LEFT)
+        self.export_workers_var = tk.IntVar(value=BatchExporter.resolve_worker_count())
+        ttk.Spinbox(workers_frame, from_=1, to=max(64, os.cpu_count() or 1), textvariable=self.export_workers_var, width=5).pack(side=tk.LEFT, padx=5)
+        
+        # 编码方案：在导出速度和文件大小之间取舍
+        profile_frame = ttk.Frame(export_frame)
+        profile_frame.pack(fill=tk.X, padx=5, pady=2)
+        ttk.Label(profile_frame, text="编码方案:").pack(side=tk.LEFT)
+        self.custom_encoder_profiles = {}
+        self.encoder_profile = DEFAULT_PROFILE
+        self.encoder_profile_var = tk.StringVar()
+        self.encoder_profile_combobox = ttk.Combobox(profile_frame, textvariable=self.encoder_profile_var, state="readonly", width=22)
+        self.encoder_profile_combobox.pack(side=tk.LEFT, padx=5)
+        self.encoder_profile_combobox.bind("<<ComboboxSelected>>", self.on_encoder_profile_select)
+        self.refresh_encoder_profiles()
+        
+        # 增量导出：跳过源文件和水印设置都未变化的图片
+        self.incremental_export_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(export_frame, text="跳过未变化的图片（增量导出）", variable=self.incremental_export_var).pack(anchor=tk.W, padx=5, pady=2)
+        
         # 模板管理
         template_frame = ttk.LabelFrame(control_frame, text="模板管理", padding="5")
         template_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -139,13 +211,29 @@ class WatermarkApp:
         list_frame = ttk.LabelFrame(right_frame, text="已导入图片", padding="5")
         list_frame.pack(fill=tk.X, padx=5, pady=5)
         
-        self.image_listbox = tk.Listbox(list_frame, selectmode=tk.SINGLE, width=50, height=5)
+        # 列表和缩略图两种视图，共用同一个图片集合
+        self.image_notebook = ttk.Notebook(list_frame)
+        self.image_notebook.pack(fill=tk.X, expand=True)
+        
+        listbox_tab = ttk.Frame(self.image_notebook)
+        self.image_notebook.add(listbox_tab, text="列表")
+        self.image_listbox = tk.Listbox(listbox_tab, selectmode=tk.SINGLE, width=50, height=5, exportselection=False)
         self.image_listbox.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=2)
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.image_listbox.yview)
+        scrollbar = ttk.Scrollbar(listbox_tab, orient=tk.VERTICAL, command=self.image_listbox.yview)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.image_listbox.config(yscrollcommand=scrollbar.set)
         self.image_listbox.bind('<<ListboxSelect>>', self.on_image_select)
         
+        # 缩略图网格只绘制可见的格子，缩略图在后台加载并缓存到磁盘
+        self.thumbnail_grid = ThumbnailGrid(
+            self.image_notebook,
+            self.imported_images,
+            ThumbnailCache(self.metadata_cache),
+            on_select=self.select_image,
+            height=170
+        )
+        self.image_notebook.add(self.thumbnail_grid, text="缩略图")
+        
         # 预览窗口
         preview_frame = ttk.LabelFrame(right_frame, text="预览", padding="5")
         preview_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
@@ -158,6 +246,9 @@ class WatermarkApp:
         self.preview_canvas.bind("<B1-Motion>", self.on_canvas_drag)
         self.preview_canvas.bind("<ButtonRelease-1>", self.on_canvas_release)
         
+        # 只在预览画布尺寸真正变化时重新渲染
+        self.preview_canvas.bind("<Configure>", self.on_canvas_configure)
+        
         # 允许拖拽导入 - 注意：Tkinter原生对文件拖拽支持有限
         # 以下代码为简化版，实际文件拖拽可能需要平台特定的实现
         # 建议用户使用导入按钮来添加文件
@@ -178,6 +269,32 @@ class WatermarkApp:
             self.opacity_var.set(opacity)
             self.opacity_label.config(text=f"{opacity}%")
             
+            # 加载并行导出进程数
+            self.export_workers_var.set(BatchExporter.resolve_worker_count(config.get("export_workers")))
+            
+            # 加载编码方案（配置中的encoder_profiles可自定义或覆盖方案参数）
+            custom_profiles = config.get("encoder_profiles")
+            self.custom_encoder_profiles = custom_profiles if isinstance(custom_profiles, dict) else {}
+            self.refresh_encoder_profiles()
+            self.set_encoder_profile(config.get("encoder_profile"))
+            
+            # 加载是否增量导出
+            self.incremental_export_var.set(bool(config.get("incremental_export", True)))
+            
+            # 加载是否按文件内容去重
+            self.imported_images.dedupe_by_content = bool(config.get("dedupe_by_content", False))
+            
+            # 加载导入校验模式（默认只解析文件头）
+            self.file_handler.full_validation = bool(config.get("full_validation", False))
+            
+            # 加载预览缓存内存上限
+            self.preview_engine.set_memory_limit(int(config.get("preview_cache_mb", 256)) * 1024 * 1024)
+            
+            # 加载自定义字体目录和字体
+            get_font_registry().add_font_dirs(config.get("font_dirs", []))
+            self.refresh_font_list()
+            self.set_font(config.get("font_path"))
+            
             # 加载其他配置
     
     def save_config(self):
@@ -186,11 +303,17 @@ class WatermarkApp:
         current_text = self.watermark_text_var.get()
         current_opacity = self.opacity_var.get()
         
-        config = {
+        # 在已有配置基础上更新，保留手动添加的配置项（如font_dirs）
+        config = self.config_manager.load_config()
+        config.update({
             "watermark_text": current_text,
             "opacity": current_opacity,
+            "export_workers": self.get_export_workers(),
+            "incremental_export": self.incremental_export_var.get(),
+            "encoder_profile": self.encoder_profile,
+            "font_path": self.watermark_processor.font_path,
             # 保存其他配置
-        }
+        })
         
         # 更新处理器中的值并保存配置
         self.watermark_processor.watermark_text = current_text
@@ -209,21 +332,81 @@ class WatermarkApp:
     def import_folder(self):
         """导入文件夹"""
         folder_path = filedialog.askdirectory()
-        if folder_path:
-            file_paths = self.file_handler.get_image_files_from_folder(folder_path)
-            if file_paths:
-                self.add_images(file_paths)
-    
-    def add_images(self, file_paths):
-        """添加图片到列表"""
-        new_images = self.file_handler.validate_images(file_paths)
-        for img_path in new_images:
-            if img_path not in self.imported_images:
-                self.imported_images.append(img_path)
-                filename = os.path.basename(img_path)
-                self.image_listbox.insert(tk.END, filename)
-                # 为新图片初始化水印位置为中心
-                self.image_watermark_positions[img_path] = (0.5, 0.5)
+        if not folder_path:
+            return
+        
+        # 在后台线程中边遍历边校验，分批加入图片列表
+        self.import_cancel_event = threading.Event()
+        self.import_queue = queue.Queue()
+        self.import_found = 0
+        self.import_folder_button.config(state=tk.DISABLED)
+        self.import_status_label.config(text="正在导入... 已找到 0 张")
+        self.import_cancel_button.config(state=tk.NORMAL)
+        self.import_cancel_button.pack(fill=tk.X, padx=5, pady=2)
+        
+        worker = threading.Thread(
+            target=self._run_folder_import,
+            args=(folder_path, self.import_cancel_event, self.import_queue),
+            daemon=True
+        )
+        worker.start()
+        self.root.after(50, self.poll_import_queue)
+    
+    def _run_folder_import(self, folder_path, cancel_event, event_queue):
+        """后台导入线程：把每批有效图片放入队列"""
+        try:
+            for batch in self.file_handler.iter_image_batches(folder_path, cancel_event=cancel_event):
+                event_queue.put(("batch", batch))
+        except Exception as e:
+            event_queue.put(("error", str(e)))
+        event_queue.put(("done", cancel_event.is_set()))
+    
+    def poll_import_queue(self):
+        """轮询导入队列，把新找到的图片加入列表"""
+        finished = None
+        error = None
+        try:
+            while True:
+                kind, payload = self.import_queue.get_nowait()
+                if kind == "batch":
+                    self.import_found += len(payload)
+                    self.add_images(payload, validated=True)
+                elif kind == "error":
+                    error = payload
+                elif kind == "done":
+                    finished = payload
+        except queue.Empty:
+            pass
+        
+        if finished is None:
+            status = "正在取消..." if self.import_cancel_event.is_set() else "正在导入..."
+            self.import_status_label.config(text=f"{status} 已找到 {self.import_found} 张")
+            self.root.after(50, self.poll_import_queue)
+            return
+        
+        # 导入结束
+        self.import_cancel_event = None
+        self.import_folder_button.config(state=tk.NORMAL)
+        self.import_cancel_button.pack_forget()
+        status = "导入已取消" if finished else "导入完成"
+        self.import_status_label.config(text=f"{status}: 共找到 {self.import_found} 张")
+        if error is not None:
+            messagebox.showerror("错误", f"导入文件夹失败: {error}")
+    
+    def cancel_import(self):
+        """取消文件夹导入"""
+        if self.import_cancel_event is not None:
+            self.import_cancel_event.set()
+            self.import_cancel_button.config(state=tk.DISABLED)
+    
+    def add_images(self, file_paths, validated=False):
+        """添加图片到列表，validated为True表示路径已经校验过"""
+        new_images = list(file_paths) if validated else self.file_handler.validate_images(file_paths)
+        # 新图片的水印位置初始化为中心，重复的图片（包括不同写法的同一路径）会被忽略
+        added_images = self.imported_images.add_many(new_images)
+        if added_images:
+            self.image_listbox.insert(tk.END, *(os.path.basename(img_path) for img_path in added_images))
+            self.thumbnail_grid.refresh()
         
         if new_images and self.current_image_index == -1:
             self.current_image_index = 0
@@ -233,13 +416,72 @@ class WatermarkApp:
         """选择图片"""
         selection = self.image_listbox.curselection()
         if selection:
-            self.current_image_index = selection[0]
-            # 恢复当前图片的水印位置设置
-            if self.current_image_index < len(self.imported_images):
-                current_image_path = self.imported_images[self.current_image_index]
-                if current_image_path in self.image_watermark_positions:
-                    self.watermark_processor.position = self.image_watermark_positions[current_image_path]
-            self.update_preview()
+            self.select_image(selection[0])
+    
+    def select_image(self, index):
+        """选择指定序号的图片，同步列表和缩略图网格的选中状态"""
+        if not 0 <= index < len(self.imported_images):
+            return
+        self.current_image_index = index
+        if tuple(self.image_listbox.curselection()) != (index,):
+            self.image_listbox.selection_clear(0, tk.END)
+            self.image_listbox.selection_set(index)
+            self.image_listbox.see(index)
+        if self.thumbnail_grid.selected_index != index:
+            self.thumbnail_grid.set_selection(index)
+        # 恢复当前图片的水印位置设置
+        self.watermark_processor.position = self.imported_images.get_position(index)
+        # 使用缓存的代理图快速切换，并在后台预读相邻图片
+        self.update_preview(fast=True)
+        self.prefetch_neighbors()
+    
+    def prefetch_neighbors(self):
+        """在后台预先解码当前图片前后相邻的图片"""
+        canvas_width = self.preview_canvas.winfo_width() - 20
+        canvas_height = self.preview_canvas.winfo_height() - 20
+        if canvas_width <= 1 or canvas_height <= 1:
+            return
+        neighbors = [
+            self.imported_images[index]
+            for index in (self.current_image_index + 1, self.current_image_index - 1)
+            if 0 <= index < len(self.imported_images)
+        ]
+        self.preview_engine.prefetch(neighbors, (canvas_width, canvas_height))
+    
+    def refresh_font_list(self):
+        """刷新字体下拉列表"""
+        self.font_choices = {"自动": None}
+        for name, path in get_font_registry().available_fonts():
+            self.font_choices.setdefault(name, path)
+        self.font_combobox.config(values=list(self.font_choices.keys()))
+    
+    def set_font(self, font_path):
+        """设置水印字体并同步下拉列表"""
+        font_path = get_font_registry().find_font(font_path) if font_path else None
+        self.watermark_processor.font_path = font_path
+        self.font_var.set(os.path.basename(font_path) if font_path else "自动")
+    
+    def on_font_select(self, event=None):
+        """选择字体"""
+        self.watermark_processor.font_path = self.font_choices.get(self.font_var.get())
+        self.update_preview()
+    
+    def refresh_encoder_profiles(self):
+        """刷新编码方案下拉列表"""
+        self.encoder_profile_choices = {}
+        for name in get_profiles(self.custom_encoder_profiles):
+            self.encoder_profile_choices[PROFILE_LABELS.get(name, name)] = name
+        self.encoder_profile_combobox.config(values=list(self.encoder_profile_choices))
+        self.set_encoder_profile(self.encoder_profile)
+    
+    def set_encoder_profile(self, profile_name):
+        """设置编码方案，不存在时使用默认方案"""
+        self.encoder_profile = resolve_profile_name(profile_name, self.custom_encoder_profiles)
+        self.encoder_profile_var.set(PROFILE_LABELS.get(self.encoder_profile, self.encoder_profile))
+    
+    def on_encoder_profile_select(self, event=None):
+        """编码方案下拉列表选择事件"""
+        self.set_encoder_profile(self.encoder_profile_choices.get(self.encoder_profile_var.get()))
     
     def update_opacity_label(self, event):
         """更新透明度标签"""
@@ -249,13 +491,25 @@ class WatermarkApp:
         """设置水印位置"""
         self.watermark_processor.position = position
         # 保存当前图片的水印位置
-        if self.current_image_index < len(self.imported_images):
-            current_image_path = self.imported_images[self.current_image_index]
-            self.image_watermark_positions[current_image_path] = position
+        if 0 <= self.current_image_index < len(self.imported_images):
+            self.imported_images.set_position(self.current_image_index, position)
         self.update_preview()
     
-    def update_preview(self, event=None):
-        """更新预览"""
+    def update_preview(self, event=None, fast=False):
+        """请求更新预览，fast为True时使用缩小的代理图快速渲染（用于拖拽过程）"""
+        # 拖拽水印期间停顿时不做完整渲染，松开鼠标后由on_canvas_release请求
+        self.preview_scheduler.request(full=not fast, settle=not self.dragging_watermark)
+    
+    def on_canvas_configure(self, event):
+        """预览画布尺寸变化时重新渲染，忽略尺寸未变的配置事件"""
+        canvas_size = (event.width, event.height)
+        if canvas_size == self.last_canvas_size:
+            return
+        self.last_canvas_size = canvas_size
+        self.update_preview()
+    
+    def render_preview(self, full, generation):
+        """提交预览渲染请求（由预览调度器调用），渲染在后台线程中进行"""
         if self.current_image_index < 0 or self.current_image_index >= len(self.imported_images):
             return
         
@@ -264,36 +518,104 @@ class WatermarkApp:
         self.watermark_processor.opacity = self.opacity_var.get()
         self.opacity_label.config(text=f"{self.opacity_var.get()}%")
         
-        # 处理预览图片
+        # 调整大小以适应画布
+        canvas_width = self.preview_canvas.winfo_width() - 20
+        canvas_height = self.preview_canvas.winfo_height() - 20
+        if canvas_width <= 1 or canvas_height <= 1:
+            return
+        
+        # 提交带设置快照的渲染请求，渲染线程不访问界面状态
         image_path = self.imported_images[self.current_image_index]
+        self.preview_renderer.submit(PreviewRequest(
+            generation,
+            image_path,
+            (canvas_width, canvas_height),
+            self.watermark_processor.get_settings(),
+            full
+        ))
+        self.last_submitted_generation = generation
+        
+        # 渲染较慢时显示占位提示
+        if self.placeholder_after_id is None:
+            self.placeholder_after_id = self.root.after(150, self.show_preview_placeholder)
+        
+        if not self.preview_polling:
+            self.preview_polling = True
+            self.root.after(15, self.poll_preview_results)
+    
+    def show_preview_placeholder(self):
+        """显示"渲染中"占位提示"""
+        self.placeholder_after_id = None
+        self.preview_canvas.delete("placeholder")
+        self.preview_canvas.create_text(
+            self.preview_canvas.winfo_width() // 2,
+            self.preview_canvas.winfo_height() // 2,
+            text="渲染中…",
+            fill="#606060",
+            font=('SimHei', 14),
+            tags="placeholder"
+        )
+    
+    def poll_preview_results(self):
+        """轮询渲染结果，只显示仍对应当前图片且比已显示内容更新的结果"""
+        latest = None
         try:
-            # 生成带水印的预览图
-            preview_img = self.watermark_processor.apply_watermark_preview(image_path)
-            
-            # 调整大小以适应画布
-            canvas_width = self.preview_canvas.winfo_width() - 20
-            canvas_height = self.preview_canvas.winfo_height() - 20
-            
-            if canvas_width > 1 and canvas_height > 1:
-                preview_img = self.watermark_processor.resize_preview(preview_img, canvas_width, canvas_height)
-                
-                # 转换为Tkinter可用的格式
-                self.preview_photo = ImageTk.PhotoImage(preview_img)
-                
-                # 清除画布并显示新图片
-                self.preview_canvas.delete("all")
-                self.preview_canvas.create_image(
-                    (canvas_width // 2) + 10,
-                    (canvas_height // 2) + 10,
-                    image=self.preview_photo
-                )
-                
-                # 记录水印位置（相对于画布）
-                self.watermark_x = (canvas_width // 2) + 10
-                self.watermark_y = (canvas_height // 2) + 10
-                
-        except Exception as e:
-            messagebox.showerror("错误", f"生成预览失败: {str(e)}")
+            while True:
+                result = self.preview_renderer.results.get_nowait()
+                self.last_finished_generation = max(self.last_finished_generation, result.request.generation)
+                if latest is None or result.request.generation > latest.request.generation:
+                    latest = result
+        except queue.Empty:
+            pass
+        
+        if latest is not None:
+            self.display_preview_result(latest)
+        
+        # 最新请求完成前继续轮询
+        if self.last_finished_generation < self.last_submitted_generation:
+            self.root.after(15, self.poll_preview_results)
+            return
+        
+        self.preview_polling = False
+        if self.placeholder_after_id is not None:
+            self.root.after_cancel(self.placeholder_after_id)
+            self.placeholder_after_id = None
+        self.preview_canvas.delete("placeholder")
+    
+    def display_preview_result(self, result):
+        """把渲染结果转换为PhotoImage并显示"""
+        request = result.request
+        # 图片已切换或已显示更新的结果时丢弃
+        if request.generation <= self.displayed_generation:
+            return
+        if self.current_image_index < 0 or self.current_image_index >= len(self.imported_images):
+            return
+        if self.imported_images[self.current_image_index] != request.image_path:
+            return
+        
+        if result.error is not None:
+            # 只报告最新请求的错误
+            if self.preview_scheduler.is_current(request.generation):
+                messagebox.showerror("错误", f"生成预览失败: {result.error}")
+            return
+        
+        self.displayed_generation = request.generation
+        canvas_width, canvas_height = request.max_size
+        
+        # 转换为Tkinter可用的格式
+        self.preview_photo = ImageTk.PhotoImage(result.image)
+        
+        # 清除画布并显示新图片
+        self.preview_canvas.delete("all")
+        self.preview_canvas.create_image(
+            (canvas_width // 2) + 10,
+            (canvas_height // 2) + 10,
+            image=self.preview_photo
+        )
+        
+        # 记录水印位置（相对于画布）
+        self.watermark_x = (canvas_width // 2) + 10
+        self.watermark_y = (canvas_height // 2) + 10
     
     def on_canvas_click(self, event):
         """画布点击事件 - 检测并开始拖拽水印"""
@@ -333,8 +655,8 @@ class WatermarkApp:
             # 更新水印位置
             self.watermark_processor.position = (new_x, new_y)
             
-            # 实时更新预览
-            self.update_preview()
+            # 实时更新预览，拖拽过程中使用代理图快速渲染
+            self.update_preview(fast=True)
     
     def on_canvas_release(self, event):
         """画布释放事件 - 结束拖拽并保存水印位置"""
@@ -347,9 +669,8 @@ class WatermarkApp:
         current_position = self.watermark_processor.position
         
         # 保存当前图片的水印位置
-        if self.current_image_index < len(self.imported_images):
-            current_image_path = self.imported_images[self.current_image_index]
-            self.image_watermark_positions[current_image_path] = current_position
+        if 0 <= self.current_image_index < len(self.imported_images):
+            self.imported_images.set_position(self.current_image_index, current_position)
             
         # 重新更新预览以确保最终效果正确
         self.update_preview()
@@ -392,47 +713,199 @@ class WatermarkApp:
         self.watermark_processor.watermark_text = self.watermark_text_var.get()
         self.watermark_processor.opacity = self.opacity_var.get()
         
-        # 导出图片
+        # 为每张图片生成独立的水印设置快照（包含各自的水印位置）
+        format_type = self.export_format_var.get().lower()
+        sources = [
+            (entry.path, self.watermark_processor.get_settings(entry.position))
+            for entry in self.imported_images.entries()
+        ]
+        naming = (self.naming_rule_var.get(), self.prefix_var.get(), self.suffix_var.get())
+        encoder_options = get_encoder_options(self.encoder_profile, format_type, self.custom_encoder_profiles)
+        
+        # 在后台线程中规划文件名并并行导出，结果通过队列按提交顺序返回给界面
+        self.export_cancel_event = threading.Event()
+        self.export_queue = queue.Queue()
+        self.export_button.config(state=tk.DISABLED)
+        self.show_export_progress(len(sources))
+        
+        worker = threading.Thread(
+            target=self._run_export,
+            args=(self.file_handler, sources, output_folder, naming, format_type, encoder_options, self.get_export_workers(),
+                  self.incremental_export_var.get(), self.export_cancel_event, self.export_queue),
+            daemon=True
+        )
+        worker.start()
+        self.root.after(100, self.poll_export_queue)
+    
+    @staticmethod
+    def _run_export(file_handler, sources, output_folder, naming, format_type, encoder_options, workers, incremental,
+                    cancel_event, event_queue):
+        """后台导出线程：生成互不冲突的输出文件名，把每个结果以事件形式放入队列"""
+        planner = None
+        output_paths = []
+        exported = set()
         try:
-            for img_path in self.imported_images:
-                # 获取输出文件名
-                output_filename = self.get_output_filename(img_path)
-                output_path = os.path.join(output_folder, output_filename)
-                
-                # 为当前图片应用其保存的水印位置
-                if img_path in self.image_watermark_positions:
-                    self.watermark_processor.position = self.image_watermark_positions[img_path]
-                else:
-                    # 如果没有保存的位置，使用默认中心位置
-                    self.watermark_processor.position = (0.5, 0.5)
-                
-                # 应用水印并保存
-                format_type = self.export_format_var.get().lower()
-                self.watermark_processor.apply_watermark_and_save(img_path, output_path, format_type)
-            
-            messagebox.showinfo("成功", "图片导出成功！")
+            # 导出清单记录输出文件的来源，重新导出时复用同一源文件的文件名，incremental为True时跳过未变化的图片
+            manifest = ExportManifest(output_folder)
+            naming_rule, prefix, suffix = naming
+            output_paths, planner = file_handler.plan_output_paths(
+                [path for path, _ in sources], output_folder, naming_rule, prefix, suffix, format_type,
+                owned_names=manifest.owned_names()
+            )
+            jobs = [
+                ExportJob(path, output_path, format_type, settings, encoder_options)
+                for (path, settings), output_path in zip(sources, output_paths)
+            ]
+            for result in BatchExporter(workers).export(jobs, cancel_event, manifest, skip_up_to_date=incremental):
+                if result.success:
+                    exported.add(result.output_path)
+                event_queue.put(("result", result))
         except Exception as e:
-            messagebox.showerror("错误", f"导出失败: {str(e)}")
-    
-    def get_output_filename(self, original_path):
-        """获取输出文件名"""
-        original_name = os.path.basename(original_path)
-        name_without_ext, ext = os.path.splitext(original_name)
-        
-        # 根据命名规则生成新文件名
-        naming_rule = self.naming_rule_var.get()
-        if naming_rule == "original":
-            new_name = name_without_ext
-        elif naming_rule == "prefix":
-            new_name = f"{self.prefix_var.get()}{name_without_ext}"
-        elif naming_rule == "suffix":
-            new_name = f"{name_without_ext}{self.suffix_var.get()}"
-        else:
-            new_name = name_without_ext
-        
-        # 添加输出格式的扩展名
-        output_ext = ".jpg" if self.export_format_var.get() == "JPEG" else ".png"
-        return f"{new_name}{output_ext}"
+            event_queue.put(("error", str(e)))
+        finally:
+            # 清理失败或被取消的图片预先占用的空文件
+            if planner is not None:
+                planner.release(path for path in output_paths if path not in exported)
+        event_queue.put(("done", cancel_event.is_set()))
+    
+    def show_export_progress(self, total):
+        """创建导出进度窗口"""
+        self.export_total = total
+        self.export_done = 0
+        self.export_skipped = 0
+        self.export_encode_time = 0.0
+        self.export_bytes = 0
+        self.export_failures = []
+        self.export_start_time = time.perf_counter()
+        
+        progress_window = tk.Toplevel(self.root)
+        progress_window.title("导出进度")
+        progress_window.geometry("500x360")
+        progress_window.transient(self.root)
+        # 导出进行中关闭窗口视为取消
+        progress_window.protocol("WM_DELETE_WINDOW", self.cancel_export)
+        self.export_window = progress_window
+        
+        self.export_progressbar = ttk.Progressbar(progress_window, maximum=total, mode="determinate")
+        self.export_progressbar.pack(fill=tk.X, padx=10, pady=10)
+        
+        self.export_status_label = ttk.Label(progress_window, text=f"已完成 0/{total}")
+        self.export_status_label.pack(anchor=tk.W, padx=10)
+        # 编码耗时和输出大小统计，导出完成后显示
+        self.export_stats_label = ttk.Label(progress_window, text="", wraplength=480)
+        self.export_stats_label.pack(anchor=tk.W, padx=10)
+        
+        # 失败文件列表
+        ttk.Label(progress_window, text="失败文件:").pack(anchor=tk.W, padx=10, pady=(10, 2))
+        failure_frame = ttk.Frame(progress_window)
+        failure_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=2)
+        self.export_failure_listbox = tk.Listbox(failure_frame, height=8)
+        self.export_failure_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        failure_scrollbar = ttk.Scrollbar(failure_frame, orient=tk.VERTICAL, command=self.export_failure_listbox.yview)
+        failure_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.export_failure_listbox.config(yscrollcommand=failure_scrollbar.set)
+        
+        self.export_cancel_button = ttk.Button(progress_window, text="取消", command=self.cancel_export)
+        self.export_cancel_button.pack(pady=10)
+    
+    def cancel_export(self):
+        """取消导出：不再派发新任务，等待处理中的图片完成"""
+        if self.export_cancel_event is not None and not self.export_cancel_event.is_set():
+            self.export_cancel_event.set()
+            self.export_cancel_button.config(state=tk.DISABLED)
+            self.export_status_label.config(text=f"正在取消... 已完成 {self.export_done}/{self.export_total}")
+    
+    def poll_export_queue(self):
+        """轮询导出事件队列并更新进度"""
+        finished = None
+        try:
+            while True:
+                kind, payload = self.export_queue.get_nowait()
+                if kind == "result":
+                    self.export_done += 1
+                    if payload.skipped:
+                        self.export_skipped += 1
+                    elif payload.success:
+                        self.export_encode_time += payload.encode_time
+                        self.export_bytes += payload.output_bytes
+                    elif not payload.success:
+                        self.export_failures.append(payload)
+                        self.export_failure_listbox.insert(tk.END, f"{os.path.basename(payload.input_path)}: {payload.error}")
+                elif kind == "error":
+                    self.export_failure_listbox.insert(tk.END, f"导出中断: {payload}")
+                elif kind == "done":
+                    finished = payload
+        except queue.Empty:
+            pass
+        
+        self.export_progressbar.config(value=self.export_done)
+        
+        if finished is None:
+            # 计算速度与剩余时间
+            elapsed = time.perf_counter() - self.export_start_time
+            rate = self.export_done / elapsed if elapsed > 0 else 0
+            if rate > 0:
+                remaining = int((self.export_total - self.export_done) / rate)
+                eta = f"{remaining // 60}:{remaining % 60:02d}"
+            else:
+                eta = "--:--"
+            if not self.export_cancel_event.is_set():
+                self.export_status_label.config(
+                    text=f"已完成 {self.export_done}/{self.export_total}  速度 {rate:.1f} 张/秒  剩余约 {eta}"
+                )
+            self.root.after(100, self.poll_export_queue)
+            return
+        
+        self.finish_export(finished)
+    
+    def finish_export(self, cancelled):
+        """导出结束后更新进度窗口"""
+        self.export_cancel_event = None
+        self.export_button.config(state=tk.NORMAL)
+        
+        elapsed = time.perf_counter() - self.export_start_time
+        succeeded = self.export_done - len(self.export_failures) - self.export_skipped
+        status = "导出已取消" if cancelled else "导出完成"
+        self.export_status_label.config(
+            text=f"{status}: 成功 {succeeded} 张, 跳过未变化 {self.export_skipped} 张, 失败 {len(self.export_failures)} 张, 共 {self.export_total} 张, 用时 {elapsed:.1f} 秒"
+        )
+        if succeeded:
+            average_ms = self.export_encode_time / succeeded * 1000
+            self.export_stats_label.config(
+                text=f"编码方案: {PROFILE_LABELS.get(self.encoder_profile, self.encoder_profile)}  平均编码 {average_ms:.0f} 毫秒/张  输出 {self.export_bytes / 1024 / 1024:.1f} MB（平均 {self.export_bytes / succeeded / 1024:.0f} KB/张）"
+            )
+        self.export_cancel_button.config(text="关闭", state=tk.NORMAL, command=self.export_window.destroy)
+        self.export_window.protocol("WM_DELETE_WINDOW", self.export_window.destroy)
+    
+    def on_closing(self):
+        """关闭主窗口：取消正在进行的导出并保存配置"""
+        if self.export_cancel_event is not None:
+            self.export_cancel_event.set()
+        if self.import_cancel_event is not None:
+            self.import_cancel_event.set()
+        # 取消尚未执行的预览渲染，避免窗口销毁后再提交
+        self.preview_scheduler.cancel()
+        self.preview_renderer.stop()
+        self.preview_engine.shutdown()
+        self.log_preview_cache_stats()
+        self.thumbnail_grid.shutdown()
+        self.save_config()
+        self.config_manager.close_metadata_cache()
+        self.root.destroy()
+    
+    def log_preview_cache_stats(self):
+        """在控制台输出预览缓存的统计信息，便于调整 preview_cache_mb"""
+        stats = self.preview_engine.stats()
+        if stats["hits"] or stats["misses"]:
+            print(f"预览缓存: 命中 {stats['hits']} 次, 未命中 {stats['misses']} 次, 淘汰 {stats['evictions']} 次, "
+                  f"占用 {stats['bytes'] / 1024 / 1024:.1f}/{stats['max_bytes'] / 1024 / 1024:.0f} MB")
+    
+    def get_export_workers(self):
+        """获取并行导出进程数"""
+        try:
+            return BatchExporter.resolve_worker_count(self.export_workers_var.get())
+        except tk.TclError:
+            return BatchExporter.resolve_worker_count()
     
     def save_template(self):
         """保存当前设置为模板"""
@@ -442,6 +915,8 @@ class WatermarkApp:
                 "watermark_text": self.watermark_text_var.get(),
                 "opacity": self.opacity_var.get(),
                 "position": self.watermark_processor.position,
+                "font_path": self.watermark_processor.font_path,
+                "encoder_profile": self.encoder_profile,
                 # 保存其他设置
             }
             self.config_manager.save_template(template_name, template)
@@ -487,6 +962,9 @@ class WatermarkApp:
             self.watermark_text_var.set(template.get("watermark_text", ""))
             self.opacity_var.set(template.get("opacity", 50))
             self.watermark_processor.position = template.get("position", (0.5, 0.5))
+            self.set_font(template.get("font_path"))
+            if "encoder_profile" in template:
+                self.set_encoder_profile(template["encoder_profile"])
             self.update_preview()
             messagebox.showinfo("成功", f"模板 '{name}' 已加载")
             template_window.destroy()
@@ -601,14 +1079,14 @@ except ImportError:
 
 def main():
     """程序主入口"""
+    # 打包为可执行文件时支持多进程导出
+    multiprocessing.freeze_support()
+    
     root = tk.Tk()
     app = WatermarkApp(root)
     
-    # 监听窗口大小变化以更新预览
-    root.bind("<Configure>", app.update_preview)
-    
     # 窗口关闭时保存配置
-    root.protocol("WM_DELETE_WINDOW", lambda: (app.save_config(), root.destroy()))
+    root.protocol("WM_DELETE_WINDOW", app.on_closing)
     
     root.mainloop()
 
@@ -0,0 +1,149 @@
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+
+from PIL import Image, ExifTags
+
+# 缓存的图片元数据，size和mtime_ns用于判断文件是否被修改
+ImageMetadata = namedtuple('ImageMetadata', [
+    'path', 'size', 'mtime_ns', 'format', 'width', 'height', 'capture_date', 'orientation', 'thumbnail'
+])
+
+# EXIF标签：拍摄时间、修改时间、方向
+EXIF_DATETIME_ORIGINAL = 0x9003
+EXIF_DATETIME = 0x0132
+EXIF_ORIENTATION = 0x0112
+
+# 数据库结构版本，结构变化时重建表
+SCHEMA_VERSION = 1
+
+# 累计多少条写入后提交一次事务
+COMMIT_INTERVAL = 256
+
+
+def read_metadata(image_path, stat=None):
+    """只解析文件头读取图片元数据，不解码像素数据"""
+    if stat is None:
+        stat = os.stat(image_path)
+    with Image.open(image_path) as img:
+        capture_date = None
+        orientation = None
+        try:
+            exif = img.getexif()
+            capture_date = exif.get_ifd(ExifTags.IFD.Exif).get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+            orientation = exif.get(EXIF_ORIENTATION)
+        except Exception:
+            pass
+        if isinstance(capture_date, bytes):
+            capture_date = capture_date.decode('ascii', 'ignore')
+        if capture_date is not None:
+            capture_date = str(capture_date).strip('\x00 ') or None
+        return ImageMetadata(image_path, stat.st_size, stat.st_mtime_ns, img.format, img.width, img.height,
+                             capture_date, int(orientation) if orientation else None, None)
+
+
+class MetadataCache:
+    def __init__(self, db_path):
+        # 数据库文件路径，多个线程共用同一个连接，由锁保证串行访问
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # 尚未提交的写入条数，批量提交以减少磁盘同步
+        self._uncommitted = 0
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._init_schema()
+
+    def _init_schema(self):
+        """创建数据表，结构版本不一致时重建"""
+        with self._lock:
+            conn = self._conn
+            try:
+                # WAL模式下写入不阻塞读取，也不需要每次提交都同步到磁盘
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            except sqlite3.DatabaseError:
+                pass
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS images")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS images ("
+                "key TEXT PRIMARY KEY, path TEXT, size INTEGER, mtime_ns INTEGER, format TEXT, "
+                "width INTEGER, height INTEGER, capture_date TEXT, orientation INTEGER, thumbnail BLOB)"
+            )
+            conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            conn.commit()
+
+    @staticmethod
+    def make_key(image_path):
+        """缓存键：规范化的绝对路径"""
+        return os.path.normcase(os.path.abspath(image_path))
+
+    @staticmethod
+    def _row_to_metadata(image_path, row):
+        return ImageMetadata(image_path, *row)
+
+    def lookup(self, image_path, stat=None):
+        """查询缓存，文件不存在或大小、修改时间变化时返回None（只需一次stat）"""
+        if stat is None:
+            try:
+                stat = os.stat(image_path)
+            except OSError:
+                return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, format, width, height, capture_date, orientation, thumbnail "
+                "FROM images WHERE key=?", (self.make_key(image_path),)
+            ).fetchone()
+        if row is None or row[0] != stat.st_size or row[1] != stat.st_mtime_ns:
+            return None
+        return self._row_to_metadata(image_path, row)
+
+    def get(self, image_path):
+        """获取元数据，缓存未命中时解析文件头并写入缓存"""
+        stat = os.stat(image_path)
+        metadata = self.lookup(image_path, stat)
+        if metadata is None:
+            metadata = read_metadata(image_path, stat)
+            self.store(metadata)
+        return metadata
+
+    def store(self, metadata):
+        """写入或替换一条元数据，文件变化后旧的缩略图一并失效"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO images "
+                "(key, path, size, mtime_ns, format, width, height, capture_date, orientation, thumbnail) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.make_key(metadata.path), metadata.path, metadata.size, metadata.mtime_ns, metadata.format,
+                 metadata.width, metadata.height, metadata.capture_date, metadata.orientation, metadata.thumbnail)
+            )
+            self._commit_if_needed()
+
+    def store_thumbnail(self, metadata, thumbnail_bytes):
+        """保存缩略图数据，只在文件未被修改时写入"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE images SET thumbnail=? WHERE key=? AND size=? AND mtime_ns=?",
+                (thumbnail_bytes, self.make_key(metadata.path), metadata.size, metadata.mtime_ns)
+            )
+            self._commit_if_needed()
+
+    def _commit_if_needed(self):
+        """累计写入达到一定条数时提交（调用方需持有锁）"""
+        self._uncommitted += 1
+        if self._uncommitted >= COMMIT_INTERVAL:
+            self._conn.commit()
+            self._uncommitted = 0
+
+    def flush(self):
+        """提交所有尚未提交的写入"""
+        with self._lock:
+            self._conn.commit()
+            self._uncommitted = 0
+
+    def close(self):
+        """提交剩余的写入并关闭数据库连接"""
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
@@ -0,0 +1,177 @@
+import os
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from lru_cache import LRUCache
+from watermark_processor import WatermarkProcessor, prepare_image_mode
+
+# 预览代理图：按画布大小解码的小图，以及原图尺寸
+PreviewProxy = namedtuple('PreviewProxy', ['image', 'original_size'])
+
+# 预览渲染请求：settings为水印设置快照，full为True时进行完整渲染
+PreviewRequest = namedtuple('PreviewRequest', ['generation', 'image_path', 'max_size', 'settings', 'full'])
+
+# 预览渲染结果：成功时image为可直接显示的RGB图片，失败时error为错误信息
+PreviewResult = namedtuple('PreviewResult', ['request', 'image', 'error'])
+
+
+def decode_proxy(image_path, max_size):
+    """把图片解码为不超过max_size的代理图，尽量避免完整解码原图"""
+    max_width, max_height = max(1, max_size[0]), max(1, max_size[1])
+    with Image.open(image_path) as img:
+        original_size = img.size
+
+        # JPEG可以在解码时直接按1/2、1/4、1/8缩小
+        img.draft(img.mode, (max_width, max_height))
+        img = prepare_image_mode(img)
+
+        # 先用整数倍快速缩小，再用高质量重采样缩放到目标大小
+        factor = min(img.width // max_width, img.height // max_height)
+        if factor > 1:
+            img = img.reduce(factor)
+        if img.width > max_width or img.height > max_height:
+            img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+
+        return PreviewProxy(img, original_size)
+
+
+def _proxy_nbytes(proxy):
+    """估算代理图占用的内存字节数"""
+    width, height = proxy.image.size
+    return width * height * len(proxy.image.getbands())
+
+
+class PreviewEngine:
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        # 已解码代理图的LRU缓存，键为 (路径, 修改时间, 文件大小, 画布大小)
+        self.cache = LRUCache(max_bytes=max_bytes, sizeof=_proxy_nbytes)
+
+        # 后台预读线程，提前解码相邻图片
+        self._prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preview-prefetch")
+        # 正在解码中的代理图，避免预读和界面重复解码同一图片
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _make_key(self, image_path, max_size):
+        """生成缓存键，文件被修改后自动失效"""
+        stat = os.stat(image_path)
+        return (image_path, stat.st_mtime_ns, stat.st_size, tuple(max_size))
+
+    def get_proxy(self, image_path, max_size):
+        """获取图片的代理图，同一图片和画布大小只解码一次"""
+        key = self._make_key(image_path, max_size)
+        proxy = self.cache.get(key)
+        if proxy is not None:
+            return proxy
+
+        with self._lock:
+            future = self._inflight.get(key)
+        if future is not None:
+            # 预读线程正在解码这张图片，等待其结果
+            return future.result()
+
+        proxy = decode_proxy(image_path, max_size)
+        self.cache.put(key, proxy)
+        return proxy
+
+    def prefetch(self, image_paths, max_size):
+        """在后台线程中预先解码图片的代理图"""
+        for image_path in image_paths:
+            try:
+                key = self._make_key(image_path, max_size)
+            except OSError:
+                continue
+            with self._lock:
+                if key in self.cache or key in self._inflight:
+                    continue
+                future = self._prefetch_executor.submit(self._prefetch_one, key, image_path, max_size)
+                self._inflight[key] = future
+
+    def _prefetch_one(self, key, image_path, max_size):
+        """预读线程：解码单张图片并写入缓存"""
+        try:
+            proxy = decode_proxy(image_path, max_size)
+            self.cache.put(key, proxy)
+            return proxy
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def set_memory_limit(self, max_bytes):
+        """调整缓存的内存上限"""
+        self.cache.resize(max_bytes=max_bytes)
+
+    def stats(self):
+        """获取代理图缓存的命中、未命中和淘汰次数等统计信息"""
+        return self.cache.stats()
+
+    def render(self, image_path, max_size, processor):
+        """在代理图上按比例绘制水印，返回可直接显示的RGB图片"""
+        proxy = self.get_proxy(image_path, max_size)
+        preview = processor.apply_watermark_to_image(proxy.image.copy(), proxy.original_size)
+        if preview.mode != 'RGB':
+            preview = preview.convert('RGB')
+        return preview
+
+    def render_full(self, image_path, max_size, processor):
+        """完整解码原图并绘制水印，再高质量缩放到画布大小"""
+        preview = processor.apply_watermark_preview(image_path)
+        return processor.resize_preview(preview, max_size[0], max_size[1])
+
+    def shutdown(self):
+        """停止预读线程"""
+        self._prefetch_executor.shutdown(wait=False)
+
+
+class PreviewRenderer:
+    def __init__(self, engine):
+        self.engine = engine
+        # 渲染结果队列，由界面线程轮询
+        self.results = queue.Queue()
+
+        # 只保留最新的一个待渲染请求，尚未开始的旧请求直接被替换
+        self._condition = threading.Condition()
+        self._pending = None
+        self._stopped = False
+
+        self._thread = threading.Thread(target=self._run, name="preview-renderer", daemon=True)
+        self._thread.start()
+
+    def submit(self, request):
+        """提交渲染请求"""
+        with self._condition:
+            self._pending = request
+            self._condition.notify()
+
+    def stop(self):
+        """停止渲染线程"""
+        with self._condition:
+            self._stopped = True
+            self._pending = None
+            self._condition.notify()
+
+    def _run(self):
+        """渲染线程：依次处理最新的请求，结果放入队列"""
+        while True:
+            with self._condition:
+                while self._pending is None and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                request = self._pending
+                self._pending = None
+
+            try:
+                # 每个请求使用独立的处理器，不与界面线程共享状态
+                processor = WatermarkProcessor.from_settings(request.settings)
+                if request.full:
+                    image = self.engine.render_full(request.image_path, request.max_size, processor)
+                else:
+                    image = self.engine.render(request.image_path, request.max_size, processor)
+                self.results.put(PreviewResult(request, image, None))
+            except Exception as e:
+                self.results.put(PreviewResult(request, None, str(e)))
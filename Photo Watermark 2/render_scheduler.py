@@ -0,0 +1,71 @@
+class RenderScheduler:
+    def __init__(self, widget, render_callback, fast_delay=15, full_delay=120):
+        # widget用于after定时，render_callback(full, generation)执行实际渲染
+        self.widget = widget
+        self.render_callback = render_callback
+        # 快速渲染和完整渲染的防抖延迟（毫秒）
+        self.fast_delay = fast_delay
+        self.full_delay = full_delay
+
+        self._after_id = None
+        self._pending_full = False
+        # 快速渲染之后补做的完整渲染，请求停止full_delay毫秒后执行
+        self._settle_id = None
+        # 每次请求递增，渲染结果的generation不等于当前值时即为过期结果
+        self.generation = 0
+
+    def request(self, full=False, settle=True):
+        """请求渲染，短时间内的多次请求合并为一次最新状态的渲染
+
+        快速请求停止后会自动补做一次完整渲染，代理图只在连续变化期间显示；
+        settle为False时不补做（如拖拽水印期间，松开鼠标时再请求完整渲染）
+        """
+        self.generation += 1
+        if self._settle_id is not None:
+            self.widget.after_cancel(self._settle_id)
+            self._settle_id = None
+        if not full and settle:
+            self._settle_id = self.widget.after(self.full_delay, self._settle)
+        if self._after_id is not None:
+            if not full:
+                # 已有待执行的渲染，快速请求直接合并，保证拖拽时仍能按固定间隔刷新
+                return
+            # 完整渲染重新计时，只有请求停止后才真正渲染
+            self.widget.after_cancel(self._after_id)
+
+        self._pending_full = self._pending_full or full
+        delay = self.full_delay if self._pending_full else self.fast_delay
+        self._after_id = self.widget.after(delay, self._fire)
+
+    def is_current(self, generation):
+        """判断某次渲染是否仍对应最新的请求"""
+        return generation == self.generation
+
+    def cancel(self):
+        """取消尚未执行的渲染"""
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        if self._settle_id is not None:
+            self.widget.after_cancel(self._settle_id)
+            self._settle_id = None
+        self._pending_full = False
+        self.generation += 1
+
+    def _fire(self):
+        """防抖计时结束，渲染最新状态"""
+        self._after_id = None
+        full = self._pending_full
+        self._pending_full = False
+        self.render_callback(full, self.generation)
+
+    def _settle(self):
+        """快速请求停止后渲染完整质量的预览，合并尚未执行的快速渲染"""
+        self._settle_id = None
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        # 完整渲染使用新的generation，否则会被当作已显示的快速渲染结果丢弃
+        self.generation += 1
+        self._pending_full = True
+        self._fire()
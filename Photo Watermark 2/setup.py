@@ -27,6 +27,7 @@ setup(
     entry_points={
         'console_scripts': [
             'photo-watermark=main:main',
+            'photo-watermark-cli=watermark_cli:main',
         ],
     },
     classifiers=[
@@ -0,0 +1,34 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from watermark_processor import WatermarkProcessor
+
+
+class ProxyWrapTest(unittest.TestCase):
+    def setUp(self):
+        self.processor = WatermarkProcessor()
+        self.processor.set_watermark_text("版权所有 Photo Watermark 示例水印文字 2024 Sample Text for wrapping")
+
+    def assert_same_wrapping(self, image_size, preview_width):
+        scale = preview_width / image_size[0]
+        full = self.processor._get_text_sprite(image_size)
+        proxy = self.processor._get_text_sprite(image_size, scale)
+        self.assertEqual(full.wrapped_text, proxy.wrapped_text,
+                         f"{image_size} 预览宽度 {preview_width}")
+
+    def test_proxy_wrapping_matches_full_size(self):
+        self.assert_same_wrapping((437, 327), 400)
+
+    def test_proxy_wrapping_matches_full_size_for_many_sizes(self):
+        for font_size in (None, 13, 27, 48):
+            self.processor.font_size = font_size
+            for image_size in ((437, 327), (1024, 768), (3001, 2000), (6000, 4000), (801, 1203)):
+                for preview_width in (160, 333, 400, 799):
+                    self.assert_same_wrapping(image_size, preview_width)
+
+
+if __name__ == "__main__":
+    unittest.main()
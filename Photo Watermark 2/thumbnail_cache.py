@@ -0,0 +1,74 @@
+import io
+
+from PIL import Image, ExifTags
+
+from watermark_processor import prepare_image_mode
+
+# EXIF IFD1中嵌入缩略图的偏移和长度标签
+JPEG_INTERCHANGE_FORMAT = 0x0201
+JPEG_INTERCHANGE_FORMAT_LENGTH = 0x0202
+
+
+def read_exif_thumbnail(img):
+    """读取JPEG中嵌入的EXIF缩略图，不存在时返回None"""
+    exif_bytes = img.info.get('exif')
+    if not exif_bytes:
+        return None
+    try:
+        ifd1 = img.getexif().get_ifd(ExifTags.IFD.IFD1)
+        offset = ifd1.get(JPEG_INTERCHANGE_FORMAT)
+        length = ifd1.get(JPEG_INTERCHANGE_FORMAT_LENGTH)
+        if not offset or not length:
+            return None
+        # 偏移量相对于TIFF头，EXIF数据前有6字节的 "Exif\0\0" 标识
+        start = offset + 6 if exif_bytes.startswith(b'Exif\x00\x00') else offset
+        thumbnail = Image.open(io.BytesIO(exif_bytes[start:start + length]))
+        thumbnail.load()
+        return thumbnail
+    except Exception:
+        return None
+
+
+def create_thumbnail(image_path, size):
+    """生成缩略图：优先使用足够大的EXIF内嵌缩略图，否则用JPEG草稿模式缩小解码"""
+    with Image.open(image_path) as img:
+        thumbnail = read_exif_thumbnail(img)
+        if thumbnail is not None and max(thumbnail.size) >= size:
+            img = thumbnail
+        else:
+            img.draft('RGB', (size, size))
+            img = prepare_image_mode(img)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        img.thumbnail((size, size), Image.Resampling.LANCZOS)
+        return img
+
+
+class ThumbnailCache:
+    def __init__(self, metadata_cache, size=128):
+        # 缩略图保存在元数据缓存数据库中，随文件修改自动失效
+        self.metadata_cache = metadata_cache
+        self.size = size
+
+    def get(self, image_path):
+        """读取缩略图，优先使用数据库中的缓存，未命中时生成并写入缓存"""
+        if self.metadata_cache is None:
+            return create_thumbnail(image_path, self.size)
+        metadata = self.metadata_cache.get(image_path)
+        if metadata.thumbnail:
+            try:
+                with Image.open(io.BytesIO(metadata.thumbnail)) as cached:
+                    if max(cached.size) == self.size or max(metadata.width, metadata.height) <= self.size:
+                        cached.load()
+                        return cached
+            except (OSError, ValueError):
+                pass
+
+        thumbnail = create_thumbnail(image_path, self.size)
+        buffer = io.BytesIO()
+        thumbnail.save(buffer, format='JPEG', quality=85)
+        try:
+            self.metadata_cache.store_thumbnail(metadata, buffer.getvalue())
+        except Exception as e:
+            print(f"写入缩略图缓存失败: {str(e)}")
+        return thumbnail
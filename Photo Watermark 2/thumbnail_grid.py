@@ -0,0 +1,284 @@
+import os
+import queue
+import tkinter as tk
+from tkinter import ttk
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import ImageTk
+
+from lru_cache import LRUCache
+
+# 缩略图加载结果：成功时image为PIL图片，跳过或失败时为None
+ThumbnailResult = namedtuple('ThumbnailResult', ['index', 'path', 'image', 'error'])
+
+
+def _thumbnail_nbytes(image):
+    """估算缩略图占用的内存字节数"""
+    width, height = image.size
+    return width * height * len(image.getbands())
+
+
+class ThumbnailGrid(ttk.Frame):
+    def __init__(self, parent, images, thumbnail_cache, on_select=None,
+                 cell_width=140, cell_height=160, height=170, memory_limit=32 * 1024 * 1024, workers=2):
+        super().__init__(parent)
+        # images为ImageCollection，网格只读取路径，不复制图片列表
+        self.images = images
+        self.thumbnail_cache = thumbnail_cache
+        self.on_select = on_select
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.selected_index = -1
+
+        self.canvas = tk.Canvas(self, bg="#ffffff", highlightthickness=0, height=height)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.canvas.config(yscrollcommand=self.scrollbar.set)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        # 当前绘制在画布上的格子：序号 -> {'path', 'items', 'photo'}，只包含可见的格子
+        self._cells = {}
+        self._columns = 1
+        # 当前可见的序号范围，加载线程据此跳过已滚出视野的图片
+        self._visible = range(0)
+        # 已解码的缩略图，按路径缓存，内存占用有上限
+        self._thumbnails = LRUCache(max_bytes=memory_limit, sizeof=_thumbnail_nbytes)
+        # 正在加载中的序号
+        self._pending = set()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail-loader")
+        self._results = queue.Queue()
+        self._polling = False
+        self._closed = False
+
+        self.canvas.bind("<Configure>", self.on_configure)
+        self.canvas.bind("<Button-1>", self.on_click)
+        # Windows和macOS使用MouseWheel事件，Linux使用Button-4/5
+        self.canvas.bind("<MouseWheel>", self.on_mousewheel)
+        self.canvas.bind("<Button-4>", lambda event: self.scroll(-1))
+        self.canvas.bind("<Button-5>", lambda event: self.scroll(1))
+        self.canvas.bind("<Enter>", lambda event: self.canvas.focus_set())
+
+    def refresh(self):
+        """图片列表变化后更新滚动区域并重绘可见格子"""
+        self._update_scrollregion()
+        self._redraw()
+
+    def set_selection(self, index):
+        """设置选中的图片，并在需要时滚动到可见位置"""
+        previous = self.selected_index
+        self.selected_index = index
+        for cell_index in (previous, index):
+            cell = self._cells.get(cell_index)
+            if cell is not None:
+                self.canvas.itemconfig(cell['items'][0], **self._cell_style(cell_index))
+        if 0 <= index < len(self.images):
+            self._scroll_into_view(index)
+
+    def shutdown(self):
+        """停止后台加载线程"""
+        self._closed = True
+        self._executor.shutdown(wait=False)
+
+    def on_configure(self, event):
+        """画布大小变化时重新计算列数"""
+        columns = max(1, event.width // self.cell_width)
+        if columns != self._columns:
+            # 列数变化后所有格子的位置都会改变，全部重新绘制
+            self._columns = columns
+            self.canvas.delete("all")
+            self._cells = {}
+        self.refresh()
+
+    def on_scrollbar(self, *args):
+        """拖动滚动条"""
+        self.canvas.yview(*args)
+        self._redraw()
+
+    def on_mousewheel(self, event):
+        """鼠标滚轮滚动"""
+        if event.delta:
+            # Windows上每格为120，macOS上为较小的整数
+            step = -event.delta // 120 if abs(event.delta) >= 120 else -event.delta
+            self.scroll(step)
+
+    def scroll(self, units):
+        """按行滚动"""
+        self.canvas.yview_scroll(units, "units")
+        self._redraw()
+
+    def on_click(self, event):
+        """点击格子选择图片"""
+        x = self.canvas.canvasx(event.x)
+        y = self.canvas.canvasy(event.y)
+        column = int(x // self.cell_width)
+        if column >= self._columns:
+            return
+        index = int(y // self.cell_height) * self._columns + column
+        if 0 <= index < len(self.images):
+            self.set_selection(index)
+            if self.on_select is not None:
+                self.on_select(index)
+
+    def _update_scrollregion(self):
+        """滚动区域由图片数量计算，不依赖已绘制的格子"""
+        rows = (len(self.images) + self._columns - 1) // self._columns
+        width = self._columns * self.cell_width
+        height = max(rows * self.cell_height, 1)
+        self.canvas.config(scrollregion=(0, 0, width, height),
+                           yscrollincrement=max(1, self.cell_height // 4))
+
+    def _visible_range(self):
+        """计算当前可见（含上下各一行缓冲）的序号范围"""
+        top = self.canvas.canvasy(0)
+        bottom = top + max(self.canvas.winfo_height(), 1)
+        first_row = max(0, int(top // self.cell_height) - 1)
+        last_row = int(bottom // self.cell_height) + 1
+        first = first_row * self._columns
+        last = min(len(self.images), (last_row + 1) * self._columns)
+        return range(first, max(first, last))
+
+    def _redraw(self):
+        """只绘制可见的格子，滚出视野的格子连同其图片对象一起删除"""
+        if self._closed:
+            return
+        visible = self._visible_range()
+        self._visible = visible
+
+        for index in [index for index in self._cells if index not in visible]:
+            self._remove_cell(index)
+
+        for index in visible:
+            path = self.images[index]
+            cell = self._cells.get(index)
+            if cell is not None and cell['path'] == path:
+                continue
+            if cell is not None:
+                self._remove_cell(index)
+            self._draw_cell(index, path)
+
+    def _cell_origin(self, index):
+        """格子左上角在画布上的坐标"""
+        row, column = divmod(index, self._columns)
+        return column * self.cell_width, row * self.cell_height
+
+    def _cell_style(self, index):
+        """格子背景样式，选中的格子高亮显示"""
+        if index == self.selected_index:
+            return {'fill': "#cce4ff", 'outline': "#3c8dde"}
+        return {'fill': "#ffffff", 'outline': "#e0e0e0"}
+
+    def _draw_cell(self, index, path):
+        """绘制单个格子：背景、缩略图（未加载时显示占位文字）和文件名"""
+        x, y = self._cell_origin(index)
+        center_x = x + self.cell_width // 2
+        image_center_y = y + (self.cell_height - 20) // 2
+        background = self.canvas.create_rectangle(
+            x + 2, y + 2, x + self.cell_width - 2, y + self.cell_height - 2, **self._cell_style(index)
+        )
+        name = os.path.basename(path)
+        if len(name) > 20:
+            name = name[:8] + "..." + name[-9:]
+        label = self.canvas.create_text(center_x, y + self.cell_height - 12, text=name, fill="#333333")
+
+        cell = {'path': path, 'items': [background, label], 'photo': None}
+        self._cells[index] = cell
+
+        thumbnail = self._thumbnails.get(path)
+        if thumbnail is not None:
+            self._show_thumbnail(index, thumbnail)
+        else:
+            cell['items'].append(self.canvas.create_text(center_x, image_center_y, text="加载中...", fill="#999999"))
+            self._request_thumbnail(index, path)
+
+    def _remove_cell(self, index):
+        """删除格子的画布元素，释放其PhotoImage"""
+        cell = self._cells.pop(index)
+        for item in cell['items']:
+            self.canvas.delete(item)
+
+    def _show_thumbnail(self, index, thumbnail):
+        """在格子中显示缩略图，PhotoImage只为可见格子创建"""
+        cell = self._cells[index]
+        for item in cell['items'][2:]:
+            self.canvas.delete(item)
+        x, y = self._cell_origin(index)
+        cell['photo'] = ImageTk.PhotoImage(thumbnail)
+        cell['items'][2:] = [self.canvas.create_image(
+            x + self.cell_width // 2, y + (self.cell_height - 20) // 2, image=cell['photo']
+        )]
+
+    def _show_error(self, index):
+        """缩略图加载失败时显示提示文字"""
+        cell = self._cells[index]
+        for item in cell['items'][2:]:
+            self.canvas.delete(item)
+        x, y = self._cell_origin(index)
+        cell['items'][2:] = [self.canvas.create_text(
+            x + self.cell_width // 2, y + (self.cell_height - 20) // 2, text="无法加载", fill="#cc0000"
+        )]
+
+    def _scroll_into_view(self, index):
+        """选中的格子不在视野内时滚动画布"""
+        _, y = self._cell_origin(index)
+        rows = (len(self.images) + self._columns - 1) // self._columns
+        total_height = max(rows * self.cell_height, 1)
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        if y < top:
+            self.canvas.yview_moveto(y / total_height)
+        elif y + self.cell_height > bottom:
+            self.canvas.yview_moveto(max(0, y + self.cell_height - self.canvas.winfo_height()) / total_height)
+        else:
+            return
+        self._redraw()
+
+    def _request_thumbnail(self, index, path):
+        """提交后台加载任务，同一格子只提交一次"""
+        if index in self._pending or self._closed:
+            return
+        self._pending.add(index)
+        self._executor.submit(self._load_thumbnail, index, path)
+        if not self._polling:
+            self._polling = True
+            self.after(30, self._poll_results)
+
+    def _load_thumbnail(self, index, path):
+        """加载线程：跳过已滚出视野的格子，其余读取磁盘缓存或生成缩略图"""
+        if index not in self._visible:
+            self._results.put(ThumbnailResult(index, path, None, None))
+            return
+        try:
+            image = self.thumbnail_cache.get(path)
+            self._results.put(ThumbnailResult(index, path, image, None))
+        except Exception as e:
+            self._results.put(ThumbnailResult(index, path, None, str(e)))
+
+    def _poll_results(self):
+        """界面线程：把加载完成的缩略图显示到仍然可见的格子上"""
+        if self._closed:
+            return
+        while True:
+            try:
+                result = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending.discard(result.index)
+            if result.image is not None:
+                self._thumbnails.put(result.path, result.image)
+
+            cell = self._cells.get(result.index)
+            if cell is None or cell['path'] != result.path:
+                continue
+            if result.image is not None:
+                self._show_thumbnail(result.index, result.image)
+            elif result.error is not None:
+                self._show_error(result.index)
+            else:
+                # 加载时已不可见、之后又滚回视野的格子重新提交
+                self._request_thumbnail(result.index, result.path)
+
+        if self._pending:
+            self.after(30, self._poll_results)
+        else:
+            self._polling = False
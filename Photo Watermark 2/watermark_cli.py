@@ -0,0 +1,253 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import multiprocessing
+
+from file_handler import FileHandler
+from watermark_processor import WatermarkProcessor
+from config_manager import ConfigManager
+from batch_exporter import BatchExporter, ExportJob
+from export_manifest import ExportManifest
+from encoder_registry import available_encoders
+from encoder_profiles import ENCODER_PROFILES, get_profiles, get_encoder_options
+from font_registry import get_font_registry
+from image_collection import ImageCollection
+
+
+def collect_input_files(inputs, file_handler=None):
+    """把文件、文件夹和通配符展开为去重后的有效图片列表"""
+    if file_handler is None:
+        file_handler = FileHandler()
+
+    # 文件夹中的图片在遍历时已经校验过，只有单独指定的文件需要再校验
+    candidates = []
+    validated = set()
+
+    def add_folder(folder_path):
+        folder_files = file_handler.get_image_files_from_folder(folder_path)
+        candidates.extend(folder_files)
+        validated.update(folder_files)
+
+    for item in inputs:
+        if os.path.isdir(item):
+            add_folder(item)
+        elif os.path.isfile(item):
+            candidates.append(item)
+        else:
+            # 视为通配符
+            for path in sorted(glob.glob(item, recursive=True)):
+                if os.path.isdir(path):
+                    add_folder(path)
+                else:
+                    candidates.append(path)
+
+    # 保持顺序去重（同一文件的不同路径写法、符号链接视为重复）
+    unique_files = ImageCollection().add_many(candidates)
+
+    valid_files = set(file_handler.validate_images([path for path in unique_files if path not in validated]))
+    return [path for path in unique_files if path in validated or path in valid_files]
+
+
+def load_settings(template_name=None, config_manager=None):
+    """读取配置，并用模板中的设置覆盖"""
+    if config_manager is None:
+        config_manager = ConfigManager()
+
+    settings = config_manager.load_config()
+    if template_name:
+        template = config_manager.load_template(template_name)
+        if template is None:
+            raise ValueError(f"模板 '{template_name}' 不存在")
+        settings.update(template)
+    return settings
+
+
+def resolve_encoder_options(export_format, profile=None, template_name=None, config_manager=None):
+    """获取编码参数，方案优先级：显式参数 > 模板 > 配置"""
+    settings = load_settings(template_name, config_manager)
+    custom_profiles = settings.get("encoder_profiles") or {}
+    if profile is None:
+        profile = settings.get("encoder_profile")
+    elif profile not in get_profiles(custom_profiles):
+        raise ValueError(f"编码方案 '{profile}' 不存在")
+    return get_encoder_options(profile, export_format, custom_profiles)
+
+
+def build_processor(template_name=None, config_manager=None, watermark_text=None, opacity=None, position=None,
+                    font=None):
+    """根据配置、模板和显式参数构建水印处理器（优先级依次升高）"""
+    settings = load_settings(template_name, config_manager)
+
+    # 自定义字体目录需在解析字体之前注册
+    font_registry = get_font_registry()
+    font_registry.add_font_dirs(settings.get("font_dirs", []))
+
+    processor = WatermarkProcessor()
+    processor.set_watermark_text(settings.get("watermark_text", processor.watermark_text))
+    processor.set_opacity(settings.get("opacity", processor.opacity))
+    processor.set_position(settings.get("position", processor.position))
+    processor.font_path = font_registry.find_font(settings.get("font_path"))
+
+    if watermark_text is not None:
+        processor.set_watermark_text(watermark_text)
+    if opacity is not None:
+        processor.set_opacity(opacity)
+    if position is not None:
+        processor.set_position(position)
+    if font is not None:
+        processor.font_path = font_registry.find_font(font)
+        if processor.font_path is None:
+            raise ValueError(f"找不到字体: {font}")
+    return processor
+
+
+def watermark_images(inputs, output_dir, template_name=None, naming_rule="original", prefix="wm_",
+                     suffix="_watermarked", export_format="jpeg", workers=None, watermark_text=None,
+                     opacity=None, position=None, font=None, full_validation=False, on_result=None,
+                     cancel_event=None, incremental=True, profile=None):
+    """批量为图片添加水印并导出，返回按输入顺序排列的ExportResult列表
+
+    inputs可以是文件、文件夹或通配符；on_result在每个结果产生时被调用；
+    incremental为True时跳过源文件和水印设置都未变化的图片；profile为编码方案名，None时使用模板或配置中的方案
+    """
+    file_handler = FileHandler()
+    file_handler.full_validation = full_validation
+    export_format = export_format.lower()
+    if export_format not in file_handler.output_formats:
+        raise ValueError(f"不支持的输出格式: {export_format}")
+
+    # 先校验模板、字体和编码方案，参数错误时不扫描输入、不创建输出目录
+    config_manager = ConfigManager()
+    processor = build_processor(template_name, config_manager, watermark_text=watermark_text, opacity=opacity, position=position,
+                                font=font)
+    settings = processor.get_settings()
+    encoder_options = resolve_encoder_options(export_format, profile, template_name, config_manager)
+
+    # 与图形界面共用元数据缓存，已处理过的文件无需重新解析
+    file_handler.metadata_cache = config_manager.get_metadata_cache()
+    try:
+        image_files = collect_input_files(inputs, file_handler)
+    finally:
+        config_manager.close_metadata_cache()
+    if not image_files:
+        return []
+
+    # 禁止导出到原文件夹，以防止覆盖原图
+    output_dir = os.path.abspath(output_dir)
+    for img_path in image_files:
+        if os.path.dirname(os.path.abspath(img_path)) == output_dir:
+            raise ValueError("禁止导出到原文件夹，以防止覆盖原图")
+    if not file_handler.ensure_directory_exists(output_dir):
+        raise ValueError(f"无法创建输出目录: {output_dir}")
+
+    # 导出清单记录输出文件的来源：重新导出时复用同一源文件的文件名，incremental为True时跳过未变化的图片
+    manifest = ExportManifest(output_dir)
+    output_paths, planner = file_handler.plan_output_paths(
+        image_files, output_dir, naming_rule, prefix, suffix, export_format, owned_names=manifest.owned_names()
+    )
+    jobs = [ExportJob(img_path, output_path, export_format, settings, encoder_options)
+            for img_path, output_path in zip(image_files, output_paths)]
+
+    results = []
+    try:
+        for result in BatchExporter(workers).export(jobs, cancel_event, manifest, skip_up_to_date=incremental):
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+    finally:
+        # 清理失败或被取消的图片预先占用的空文件
+        exported = {result.output_path for result in results if result.success}
+        planner.release(path for path in output_paths if path not in exported)
+    return results
+
+
+def parse_position(value):
+    """解析 "x,y" 形式的相对位置"""
+    try:
+        x, y = (float(part) for part in value.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError("位置格式应为 x,y，取值范围 0-1")
+    return x, y
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="watermark_cli", description="批量为图片添加文本水印（命令行模式）")
+    parser.add_argument('inputs', nargs='+', help='输入图片文件、文件夹或通配符')
+    parser.add_argument('--output', '-o', required=True, help='输出文件夹')
+    parser.add_argument('--template', '-t', help='使用已保存的水印模板')
+    parser.add_argument('--text', help='水印文本（覆盖模板设置）')
+    parser.add_argument('--opacity', type=int, help='水印透明度 0-100（覆盖模板设置）')
+    parser.add_argument('--position', type=parse_position, help='水印相对位置 x,y（覆盖模板设置）')
+    parser.add_argument('--font', help='字体文件路径或文件名，如 msyh.ttc（覆盖模板设置）')
+    parser.add_argument('--format', '-f', default='jpeg', choices=[encoder.name for encoder in available_encoders()],
+                        help='输出格式')
+    parser.add_argument('--profile', '-p', help=f"编码方案：{'、'.join(ENCODER_PROFILES)}（默认使用模板或配置中的方案）")
+    parser.add_argument('--naming', default='original', choices=['original', 'prefix', 'suffix'], help='命名规则')
+    parser.add_argument('--prefix', default='wm_', help='命名规则为prefix时使用的前缀')
+    parser.add_argument('--suffix', default='_watermarked', help='命名规则为suffix时使用的后缀')
+    parser.add_argument('--workers', '-j', type=int, default=None, help='并行进程数（默认为CPU核心数）')
+    parser.add_argument('--force', action='store_true', help='重新导出所有图片（默认跳过源文件和设置都未变化的图片）')
+    parser.add_argument('--verify', action='store_true', help='导入时完整校验图片数据（默认只解析文件头）')
+    parser.add_argument('--quiet', '-q', action='store_true', help='只输出失败信息和统计')
+
+    args = parser.parse_args(argv)
+
+    start_time = time.perf_counter()
+    failures = []
+    skipped = []
+
+    def on_result(result):
+        if result.skipped:
+            skipped.append(result)
+        elif not result.success:
+            failures.append(result)
+            print(f"失败: {result.input_path}: {result.error}", file=sys.stderr)
+        elif not args.quiet:
+            print(f"完成: {result.output_path}  编码 {result.encode_time * 1000:.0f} 毫秒, {result.output_bytes / 1024:.0f} KB")
+
+    try:
+        results = watermark_images(
+            args.inputs,
+            args.output,
+            template_name=args.template,
+            naming_rule=args.naming,
+            prefix=args.prefix,
+            suffix=args.suffix,
+            export_format=args.format,
+            workers=args.workers,
+            watermark_text=args.text,
+            opacity=args.opacity,
+            position=args.position,
+            font=args.font,
+            full_validation=args.verify,
+            on_result=on_result,
+            incremental=not args.force,
+            profile=args.profile
+        )
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 2
+
+    if not results:
+        print("没有找到有效的图片", file=sys.stderr)
+        return 1
+
+    elapsed = time.perf_counter() - start_time
+    succeeded = len(results) - len(failures) - len(skipped)
+    rate = len(results) / elapsed if elapsed > 0 else 0
+    print(f"处理完成: 成功 {succeeded} 张, 跳过未变化 {len(skipped)} 张, 失败 {len(failures)} 张, "
+          f"用时 {elapsed:.1f} 秒 ({rate:.1f} 张/秒)")
+    if succeeded:
+        encoded = [result for result in results if result.success and not result.skipped]
+        encode_time = sum(result.encode_time for result in encoded)
+        output_bytes = sum(result.output_bytes for result in encoded)
+        print(f"编码统计: 平均编码 {encode_time / succeeded * 1000:.0f} 毫秒/张, "
+              f"输出 {output_bytes / 1024 / 1024:.1f} MB (平均 {output_bytes / succeeded / 1024:.0f} KB/张)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,6 +1,41 @@
-from PIL import Image, ImageDraw, ImageFont
-import os
+from PIL import Image, ImageDraw
 import textwrap
+import time
+from collections import namedtuple
+
+from lru_cache import LRUCache
+from font_registry import get_font_registry
+from encoder_registry import get_encoder
+
+# 水印设置快照（不可变），用于在线程/进程之间传递某一张图片的完整水印参数
+WatermarkSettings = namedtuple(
+    'WatermarkSettings',
+    ['watermark_text', 'opacity', 'position', 'font_size', 'font_path', 'text_color']
+)
+
+# 渲染好的文字精灵图：紧贴文字边界的RGBA小图，offset为精灵图左上角相对文字原点的偏移，wrapped_text为换行后的文字
+TextSprite = namedtuple('TextSprite', ['image', 'offset', 'text_size', 'wrapped_text'])
+
+
+def _sprite_nbytes(sprite):
+    """估算精灵图占用的内存字节数"""
+    width, height = sprite.image.size
+    return width * height * 4
+
+
+def prepare_image_mode(image):
+    """按需转换图片模式：不透明图片使用RGB，带透明通道的图片使用RGBA，不做多余复制"""
+    # 确保像素数据已读入，文件关闭后图片仍可用
+    image.load()
+    if image.mode in ('RGB', 'RGBA'):
+        return image
+    if image.mode in ('LA', 'PA', 'La', 'RGBa') or 'transparency' in image.info:
+        return image.convert('RGBA')
+    return image.convert('RGB')
+
+
+# 进程内共享的文字精灵图缓存，同一批相同尺寸、相同设置的图片只需渲染一次文字
+SPRITE_CACHE = LRUCache(max_bytes=64 * 1024 * 1024, sizeof=_sprite_nbytes)
 
 class WatermarkProcessor:
     def __init__(self):
@@ -12,23 +47,43 @@ class WatermarkProcessor:
         self.font_path = None  # 自动选择系统字体
         self.text_color = (255, 255, 0)  # 黄色文字，更显眼
     
+    @classmethod
+    def from_settings(cls, settings):
+        """根据设置快照创建独立的处理器"""
+        processor = cls()
+        processor.watermark_text = settings.watermark_text
+        processor.set_opacity(settings.opacity)
+        processor.set_position(settings.position)
+        processor.font_size = settings.font_size
+        processor.font_path = settings.font_path
+        processor.text_color = tuple(settings.text_color)
+        return processor
+    
+    def get_settings(self, position=None):
+        """获取当前水印设置的快照，可指定覆盖位置"""
+        if position is None:
+            position = self.position
+        # 记录实际使用的字体路径，使其他进程使用同一字体
+        font_path = get_font_registry().find_font(self.font_path) or get_font_registry().resolve_default_path()
+        return WatermarkSettings(
+            watermark_text=self.watermark_text,
+            opacity=self.opacity,
+            position=tuple(position),
+            font_size=self.font_size,
+            font_path=font_path,
+            text_color=tuple(self.text_color)
+        )
+    
     def apply_watermark_preview(self, image_path):
         """生成带水印的预览图片"""
         try:
             # 打开原图
             with Image.open(image_path) as base_image:
-                # 转换为RGBA以支持透明度
-                if base_image.mode != 'RGBA':
-                    base_image = base_image.convert('RGBA')
-                
-                # 创建水印层
-                watermark = self._create_watermark_layer(base_image.size)
+                # 不透明图片保持RGB，只有带透明通道的图片才使用RGBA
+                base_image = prepare_image_mode(base_image)
                 
-                # 计算水印位置
-                x, y = self._calculate_position(base_image.size, watermark.size)
-                
-                # 将水印粘贴到原图上
-                result = Image.alpha_composite(base_image, watermark)
+                # 只在文字所在区域混合水印，无需分配和混合整幅水印层
+                result = self._composite_sprite(base_image)
                 
                 # 返回结果（转换回RGB用于显示）
                 if result.mode == 'RGBA':
@@ -37,70 +92,104 @@ class WatermarkProcessor:
         except Exception as e:
             raise Exception(f"应用水印失败: {str(e)}")
     
-    def apply_watermark_and_save(self, input_path, output_path, format_type):
-        """应用水印并保存图片"""
+    def apply_watermark_and_save(self, input_path, output_path, format_type, encoder_options=None):
+        """应用水印并用format_type对应的编码器保存图片，encoder_options为编码参数（None时使用默认参数），返回编码耗时（秒）"""
         try:
+            encoder = get_encoder(format_type)
+
             # 打开原图
             with Image.open(input_path) as base_image:
-                # 转换为RGBA以支持透明度
-                if base_image.mode != 'RGBA':
-                    base_image = base_image.convert('RGBA')
-                
-                # 创建水印层
-                watermark = self._create_watermark_layer(base_image.size)
+                # 不透明图片保持RGB，只有带透明通道的图片才使用RGBA
+                base_image = prepare_image_mode(base_image)
                 
-                # 计算水印位置
-                x, y = self._calculate_position(base_image.size, watermark.size)
+                # 只在文字所在区域混合水印，无需分配和混合整幅水印层
+                result = self._composite_sprite(base_image)
                 
-                # 将水印粘贴到原图上
-                result = Image.alpha_composite(base_image, watermark)
-                
-                # 保存图片
-                if format_type == 'jpeg':
-                    # JPEG不支持透明度，转换为RGB
-                    if result.mode == 'RGBA':
-                        result = result.convert('RGB')
-                    result.save(output_path, format='JPEG', quality=95, subsampling=0)
-                else:  # png
-                    if result.mode != 'RGBA':
-                        result = result.convert('RGBA')
-                    result.save(output_path, format='PNG', compress_level=1)
+                # 保存图片，不支持透明度的格式由编码器转换为RGB
+                start_time = time.perf_counter()
+                encoder.save(result, output_path, encoder_options)
+                return time.perf_counter() - start_time
         except Exception as e:
             raise Exception(f"保存带水印图片失败: {str(e)}")
     
-    def _create_watermark_layer(self, image_size):
-        """创建水印层"""
-        # 创建透明背景
-        watermark_layer = Image.new('RGBA', image_size, (255, 255, 255, 0))
-        draw = ImageDraw.Draw(watermark_layer)
+    def apply_watermark_to_image(self, image, reference_size=None):
+        """在已解码的图片上绘制水印（原地修改RGB/RGBA图片）
+
+        reference_size为原图尺寸，图片是缩小后的代理图时，水印按相同比例缩小绘制
+        """
+        image = prepare_image_mode(image)
+        scale = 1.0
+        if reference_size is not None and reference_size[0] > 0:
+            scale = image.width / reference_size[0]
+        return self._composite_sprite(image, reference_size, scale)
+    
+    def _composite_sprite(self, base_image, reference_size=None, scale=1.0):
+        """将文字精灵图混合到RGB或RGBA原图的对应区域（原地修改并返回原图）"""
+        sprite = self._get_text_sprite(reference_size or base_image.size, scale)
+        x, y = self._calculate_sprite_position(base_image.size, sprite)
         
+        # 裁剪超出原图边界的部分
+        sprite_width, sprite_height = sprite.image.size
+        left = max(0, -x)
+        top = max(0, -y)
+        right = min(sprite_width, base_image.width - x)
+        bottom = min(sprite_height, base_image.height - y)
+        if right <= left or bottom <= top:
+            return base_image
+        
+        if base_image.mode == 'RGBA':
+            base_image.alpha_composite(sprite.image, dest=(x + left, y + top), source=(left, top, right, bottom))
+        else:
+            # 不透明原图：以精灵图的透明通道为蒙版直接混合，无需转换为RGBA
+            region = sprite.image.crop((left, top, right, bottom))
+            base_image.paste(region, (x + left, y + top), region)
+        return base_image
+    
+    def _get_text_sprite(self, image_size, scale=1.0):
+        """获取当前设置下的文字精灵图，优先从缓存读取
+
+        image_size为原图尺寸，scale为实际绘制尺寸相对原图的缩放比例
+        """
         # 计算字体大小 - 增大字体比例
         if self.font_size is None:
             font_size = max(20, min(image_size[0], image_size[1]) // 10)
         else:
             font_size = self.font_size
         
+        # 计算透明度
+        alpha = int(255 * (self.opacity / 100))
+        
+        # 每行字符数按原图尺寸计算（换行宽度为图片宽度的一半），代理图只缩小字形，换行位置与导出结果一致
+        line_width = self._line_width(image_size[0] // 2, font_size)
+        if scale != 1.0:
+            font_size = max(1, int(round(font_size * scale)))
+        # 缓存键包含所有影响像素结果的参数
+        key = (self.watermark_text, self.font_path, font_size, line_width, tuple(self.text_color), alpha)
+        return SPRITE_CACHE.get_or_create(key, lambda: self._render_text_sprite(font_size, line_width, alpha))
+    
+    def _render_text_sprite(self, font_size, line_width, alpha):
+        """把文字渲染到紧贴文字边界的透明小图上"""
         # 尝试加载字体
         font = self._load_font(font_size)
         
         # 处理文本换行
-        wrapped_text = self._wrap_text(self.watermark_text, image_size[0] // 2, font)
+        wrapped_text = self._wrap_text(self.watermark_text, line_width)
         
         # 计算文本边界框
-        text_bbox = draw.textbbox((0, 0), wrapped_text, font=font)
+        measure = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+        text_bbox = measure.textbbox((0, 0), wrapped_text, font=font)
         text_width = text_bbox[2] - text_bbox[0]
         text_height = text_bbox[3] - text_bbox[1]
         
-        # 计算水印位置
-        x = (image_size[0] - text_width) * self.position[0]
-        y = (image_size[1] - text_height) * self.position[1]
-        
-        # 计算透明度
-        alpha = int(255 * (self.opacity / 100))
+        # 精灵图四周预留描边宽度
+        stroke_width = 1
+        sprite = Image.new('RGBA', (text_width + 2 * stroke_width, text_height + 2 * stroke_width), (255, 255, 255, 0))
+        draw = ImageDraw.Draw(sprite)
+        x = stroke_width - text_bbox[0]
+        y = stroke_width - text_bbox[1]
         
         # 创建半透明文字，增强可见性
         # 先绘制黑色描边，使文字在任何背景上都更清晰可见
-        stroke_width = 1
         for dx in [-stroke_width, 0, stroke_width]:
             for dy in [-stroke_width, 0, stroke_width]:
                 if dx != 0 or dy != 0:
@@ -108,96 +197,39 @@ class WatermarkProcessor:
         # 绘制文本
         draw.text((x, y), wrapped_text, font=font, fill=(self.text_color[0], self.text_color[1], self.text_color[2], alpha))
         
-        return watermark_layer
+        offset = (text_bbox[0] - stroke_width, text_bbox[1] - stroke_width)
+        return TextSprite(sprite, offset, (text_width, text_height), wrapped_text)
+    
+    def _calculate_sprite_position(self, image_size, sprite):
+        """计算精灵图在原图中的左上角坐标"""
+        text_width, text_height = sprite.text_size
+        x = (image_size[0] - text_width) * self.position[0]
+        y = (image_size[1] - text_height) * self.position[1]
+        return int(round(x)) + sprite.offset[0], int(round(y)) + sprite.offset[1]
     
     def _load_font(self, font_size):
         """加载合适的字体，确保中文正常显示"""
-        # 尝试加载系统字体
-        try:
-            # 在Windows上尝试加载中文字体
-            if os.name == 'nt':
-                # Windows系统字体路径
-                windows_font_dir = os.path.join(os.environ.get('WINDIR', 'C:\Windows'), 'Fonts')
-                
-                # 尝试直接通过字体文件路径加载
-                font_paths = [
-                    os.path.join(windows_font_dir, 'simhei.ttf'),  # 黑体
-                    os.path.join(windows_font_dir, 'msyh.ttc'),    # 微软雅黑
-                    os.path.join(windows_font_dir, 'simsun.ttc'),   # 宋体
-                    os.path.join(windows_font_dir, 'simkai.ttf'),   # 楷体
-                ]
-                
-                for font_path in font_paths:
-                    if os.path.exists(font_path):
-                        try:
-                            return ImageFont.truetype(font_path, font_size)
-                        except:
-                            continue
-                
-                # 再尝试字体名称方式
-                font_names = [
-                    'SimHei', '黑体',
-                    'Microsoft YaHei', '微软雅黑',
-                    'SimSun', '宋体',
-                    'KaiTi', '楷体',
-                    'Arial Unicode MS',
-                    'Arial'
-                ]
-                
-                for font_name in font_names:
-                    try:
-                        return ImageFont.truetype(font_name, font_size)
-                    except:
-                        continue
-            else:  # 其他系统
-                font_names = [
-                    'Arial Unicode MS',
-                    'WenQuanYi Micro Hei',
-                    'Heiti TC',
-                    'Arial',
-                    'Helvetica'
-                ]
-                
-                for font_name in font_names:
-                    try:
-                        return ImageFont.truetype(font_name, font_size)
-                    except:
-                        continue
-            
-            # 如果都失败，使用默认字体
-            print("警告：无法加载中文字体，可能导致中文显示异常")
-            return ImageFont.load_default()
-        except Exception as e:
-            print(f"加载字体时出错: {str(e)}")
-            return ImageFont.load_default()
+        # 字体只在进程内解析一次，字体对象按 (路径, 字号) 缓存
+        return get_font_registry().get_font(self.font_path, font_size)
+    
+    @staticmethod
+    def _line_width(max_width, font_size):
+        """估计每行的字符数（按平均字符宽度为字号的一半粗略估计）"""
+        return max(1, max_width // max(1, font_size // 2))
     
-    def _wrap_text(self, text, max_width, font):
-        """自动换行文本"""
+    def _wrap_text(self, text, line_width):
+        """自动换行文本，line_width为每行字符数"""
         # 使用textwrap进行简单的换行处理
         # 注意：这只是基于字符数的粗略估计，可能不够精确
         lines = []
         for paragraph in text.split('\n'):
-            # 估计每行的字符数
-            avg_char_width = max_width // (font.size // 2)  # 粗略估计
-            wrapped_lines = textwrap.wrap(paragraph, width=avg_char_width)
+            wrapped_lines = textwrap.wrap(paragraph, width=line_width)
             if not wrapped_lines:
                 lines.append('')
             else:
                 lines.extend(wrapped_lines)
         return '\n'.join(lines)
     
-    def _calculate_position(self, base_size, watermark_size):
-        """计算水印的实际位置"""
-        # 使用相对坐标计算实际像素位置
-        x = (base_size[0] - watermark_size[0]) * self.position[0]
-        y = (base_size[1] - watermark_size[1]) * self.position[1]
-        
-        # 确保位置在有效范围内
-        x = max(0, min(x, base_size[0] - watermark_size[0]))
-        y = max(0, min(y, base_size[1] - watermark_size[1]))
-        
-        return int(x), int(y)
-    
     def resize_preview(self, image, max_width, max_height):
         """调整图片大小以适应预览窗口"""
         # 保持宽高比